@@ -3,10 +3,15 @@ Knowledge Graph Pipeline using Neo4j GraphRAG
 Processes unstructured data (profiles, pages) into structured graph entities
 """
 
+import asyncio
+import hashlib
 import logging
-from pathlib import Path
+import uuid
+from contextlib import contextmanager
 from typing import Optional, Dict, Any
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
+from neo4j_graphrag.experimental.components.kg_writer import KGWriterModel, Neo4jWriter
+from neo4j_graphrag.experimental.components.types import LexicalGraphConfig, Neo4jGraph
 from neo4j_graphrag.experimental.pipeline.kg_builder import SimpleKGPipeline
 from neo4j_graphrag.llm import LLMInterface
 from neo4j_graphrag.embeddings import Embedder
@@ -14,6 +19,36 @@ from neo4j_graphrag.embeddings import Embedder
 logger = logging.getLogger(__name__)
 
 
+# Label SimpleKGPipeline's writer puts on every node it creates
+KG_NODE_LABEL = "__KGBuilder__"
+
+# Lexical-graph label SimpleKGPipeline uses for each ingested file
+DOCUMENT_LABEL = "Document"
+
+# Extracted nodes/relationships are staged per run and flushed with UNWIND in batches of this size
+# (the library default; the kg_node_id index is what keeps each batch's id lookups from scanning)
+KG_WRITE_BATCH_SIZE = 1000
+
+# Marker the writer puts on every node of a run; removed again once the run's nodes are tagged
+KG_RUN_ID_PROPERTY = "kg_run_id"
+
+# Attribution keeps the first source and creation time of shared entities and
+# appends later sources to source_urls
+TAG_RUN_NODES_QUERY = f"""
+MATCH (n:{KG_NODE_LABEL} {{{KG_RUN_ID_PROPERTY}: $run_id}})
+SET n.source_url = coalesce(n.source_url, $source_url),
+    n.source_type = coalesce(n.source_type, $source_type),
+    n.source_title = coalesce(n.source_title, $title),
+    n.source_urls = CASE
+        WHEN $source_url IN coalesce(n.source_urls, []) THEN n.source_urls
+        ELSE coalesce(n.source_urls, []) + $source_url
+    END,
+    n.created_at = coalesce(n.created_at, datetime()),
+    n.updated_at = datetime()
+REMOVE n.{KG_RUN_ID_PROPERTY}
+RETURN count(n) AS tagged_count
+"""
+
 # Profile extraction schema
 PROFILE_ENTITIES = [
     "Person",
@@ -56,29 +91,141 @@ PAGE_RELATIONS = [
 ]
 
 
+class SourceTaggingWriter(Neo4jWriter):
+    """
+    Neo4jWriter that attributes every node it writes to the current run's source
+    Nodes carry a run marker through the write and are tagged by that marker
+    afterwards, so existing attribution on shared entities is kept. The run's
+    Document also gets the content hash used for duplicate detection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.source: Dict[str, Any] = {}
+        self.content_hash: Optional[str] = None
+
+    async def run(
+        self,
+        graph: Neo4jGraph,
+        lexical_graph_config: LexicalGraphConfig = LexicalGraphConfig()
+    ) -> KGWriterModel:
+        if not self.source:
+            return await super().run(graph, lexical_graph_config)
+
+        run_id = uuid.uuid4().hex
+        for node in graph.nodes:
+            node.properties[KG_RUN_ID_PROPERTY] = run_id
+            if node.label == DOCUMENT_LABEL and self.content_hash:
+                node.properties["content_hash"] = self.content_hash
+        result = await super().run(graph, lexical_graph_config)
+
+        records, _, _ = await asyncio.to_thread(
+            self.driver.execute_query,
+            TAG_RUN_NODES_QUERY,
+            database_=self.neo4j_database,
+            run_id=run_id,
+            **self.source
+        )
+        logger.info(f"   → Tagged {records[0]['tagged_count']} nodes with source: {self.source['source_url']}")
+        return result
+
+
 class KGPipelineService:
     """Service for running knowledge graph extraction pipelines"""
     
     def __init__(
         self,
         neo4j_driver: Driver,
+        async_driver: AsyncDriver,
         llm: Optional[LLMInterface] = None,
-        embedder: Optional[Embedder] = None
+        embedder: Optional[Embedder] = None,
+        database: Optional[str] = None
     ):
+        # SimpleKGPipeline requires the sync driver; our own Cypher uses the async one
         self.driver = neo4j_driver
+        self.async_driver = async_driver
         self.llm = llm
         self.embedder = embedder
+        # Same database as Neo4jService (NEO4J_DATABASE); None uses the server default
+        self._db = database
+        self._schema_ready = False
+        # Builders are created on first use and reused for every later run
+        self._profile_builder: Optional[SimpleKGPipeline] = None
+        self._page_builder: Optional[SimpleKGPipeline] = None
+        self._kg_writer: Optional[SourceTaggingWriter] = None
+        # Runs are serialized: the shared writer tags nodes with the current run's source
+        self._pipeline_lock = asyncio.Lock()
+    
+    def _get_kg_writer(self) -> SourceTaggingWriter:
+        """Writer shared by both builders; batches entity and relationship writes"""
+        if self._kg_writer is None:
+            self._kg_writer = SourceTaggingWriter(
+                self.driver,
+                neo4j_database=self._db,
+                batch_size=KG_WRITE_BATCH_SIZE
+            )
+        return self._kg_writer
+    
+    @contextmanager
+    def _tag_writes(
+        self,
+        content_hash: str,
+        source_url: str,
+        source_type: str,
+        title: Optional[str] = None
+    ):
+        """Have the writer tag nodes with this source while a pipeline run is in progress"""
+        writer = self._get_kg_writer()
+        writer.source = {
+            "source_url": source_url,
+            "source_type": source_type,
+            "title": title
+        }
+        writer.content_hash = content_hash
+        try:
+            yield
+        finally:
+            writer.source = {}
+            writer.content_hash = None
+    
+    def _get_profile_builder(self) -> SimpleKGPipeline:
+        if self._profile_builder is None:
+            self._profile_builder = SimpleKGPipeline(
+                llm=self.llm,
+                driver=self.driver,
+                embedder=self.embedder,
+                from_pdf=False,  # We're processing markdown text
+                entities=PROFILE_ENTITIES,
+                relations=PROFILE_RELATIONS,
+                kg_writer=self._get_kg_writer(),
+                neo4j_database=self._db,
+            )
+        return self._profile_builder
+    
+    def _get_page_builder(self) -> SimpleKGPipeline:
+        if self._page_builder is None:
+            self._page_builder = SimpleKGPipeline(
+                llm=self.llm,
+                driver=self.driver,
+                embedder=self.embedder,
+                from_pdf=False,  # We're processing markdown text
+                entities=PAGE_ENTITIES,
+                relations=PAGE_RELATIONS,
+                kg_writer=self._get_kg_writer(),
+                neo4j_database=self._db,
+            )
+        return self._page_builder
     
     async def process_profile(
         self,
-        markdown_path: Path,
+        markdown_content: str,
         profile_url: str
     ) -> Dict[str, Any]:
         """
-        Process a profile markdown file through the KG pipeline
+        Process profile markdown through the KG pipeline
         
         Args:
-            markdown_path: Path to the markdown file
+            markdown_content: Scraped profile markdown
             profile_url: URL of the profile (used as source identifier)
             
         Returns:
@@ -89,24 +236,25 @@ class KGPipelineService:
             return {"status": "skipped", "reason": "no_llm"}
         
         try:
+            content_hash = self._content_hash(markdown_content)
+            document_id = await self._find_ingested_document(content_hash, profile_url)
+            if document_id:
+                logger.info(f"✓ Profile content already in KG, skipping extraction: {profile_url}")
+                return {
+                    "status": "skipped",
+                    "reason": "duplicate_content",
+                    "document_id": document_id,
+                    "source_url": profile_url
+                }
+
             logger.info(f"🧠 Running KG pipeline for profile: {profile_url}")
             
-            kg_builder = SimpleKGPipeline(
-                llm=self.llm,
-                driver=self.driver,
-                embedder=self.embedder,
-                from_pdf=False,  # We're processing markdown text
-                entities=PROFILE_ENTITIES,
-                relations=PROFILE_RELATIONS,
-            )
-            
-            # Run the pipeline
-            result = await kg_builder.run_async(file_path=str(markdown_path))
-            
-            logger.info(f"✓ Profile KG extraction complete")
-            
-            # Tag extracted nodes with source URL
-            self._tag_nodes_with_source(profile_url, "profile")
+            async with self._pipeline_lock:
+                # Run the pipeline; written nodes are tagged with the source URL
+                with self._tag_writes(content_hash, profile_url, "profile"):
+                    result = await self._get_profile_builder().run_async(text=markdown_content)
+                
+                logger.info(f"✓ Profile KG extraction complete")
             
             return {
                 "status": "success",
@@ -124,15 +272,15 @@ class KGPipelineService:
     
     async def process_page(
         self,
-        markdown_path: Path,
+        markdown_content: str,
         page_url: str,
         page_title: str
     ) -> Dict[str, Any]:
         """
-        Process a webpage markdown file through the KG pipeline
+        Process webpage markdown through the KG pipeline
         
         Args:
-            markdown_path: Path to the markdown file
+            markdown_content: Scraped page markdown
             page_url: URL of the page
             page_title: Title of the page
             
@@ -144,24 +292,26 @@ class KGPipelineService:
             return {"status": "skipped", "reason": "no_llm"}
         
         try:
+            content_hash = self._content_hash(markdown_content)
+            document_id = await self._find_ingested_document(content_hash, page_url, page_title)
+            if document_id:
+                logger.info(f"✓ Page content already in KG, skipping extraction: {page_title}")
+                return {
+                    "status": "skipped",
+                    "reason": "duplicate_content",
+                    "document_id": document_id,
+                    "source_url": page_url,
+                    "title": page_title
+                }
+
             logger.info(f"🧠 Running KG pipeline for page: {page_title}")
             
-            kg_builder = SimpleKGPipeline(
-                llm=self.llm,
-                driver=self.driver,
-                embedder=self.embedder,
-                from_pdf=False,  # We're processing markdown text
-                entities=PAGE_ENTITIES,
-                relations=PAGE_RELATIONS,
-            )
-            
-            # Run the pipeline
-            result = await kg_builder.run_async(file_path=str(markdown_path))
-            
-            logger.info(f"✓ Page KG extraction complete")
-            
-            # Tag extracted nodes with source URL and title
-            self._tag_nodes_with_source(page_url, "page", page_title)
+            async with self._pipeline_lock:
+                # Run the pipeline; written nodes are tagged with the source URL and title
+                with self._tag_writes(content_hash, page_url, "page", page_title):
+                    result = await self._get_page_builder().run_async(text=markdown_content)
+                
+                logger.info(f"✓ Page KG extraction complete")
             
             return {
                 "status": "success",
@@ -178,32 +328,57 @@ class KGPipelineService:
                 "source_url": page_url
             }
     
-    def _tag_nodes_with_source(
+    async def _ensure_schema(self, session):
+        """Create the indexes used for writes, source and duplicate lookups (once per service)"""
+        if self._schema_ready:
+            return
+        # The writer MERGEs nodes and matches relationship endpoints on id. Ids are
+        # only unique within a run, so this must stay a plain index, not a constraint
+        await session.run(f"""
+            CREATE INDEX kg_node_id IF NOT EXISTS
+            FOR (n:{KG_NODE_LABEL}) ON (n.id)
+        """)
+        await session.run(f"""
+            CREATE INDEX kg_run_id IF NOT EXISTS
+            FOR (n:{KG_NODE_LABEL}) ON (n.{KG_RUN_ID_PROPERTY})
+        """)
+        await session.run(f"""
+            CREATE INDEX kg_source_url IF NOT EXISTS
+            FOR (n:{KG_NODE_LABEL}) ON (n.source_url)
+        """)
+        await session.run(f"""
+            CREATE INDEX kg_document_content_hash IF NOT EXISTS
+            FOR (d:{DOCUMENT_LABEL}) ON (d.content_hash)
+        """)
+        self._schema_ready = True
+    
+    @staticmethod
+    def _content_hash(markdown_content: str) -> str:
+        """Fingerprint the markdown so re-ingesting identical content can be skipped"""
+        return hashlib.sha1(markdown_content.encode("utf-8")).hexdigest()
+    
+    async def _find_ingested_document(
         self,
+        content_hash: str,
         source_url: str,
-        source_type: str,
         title: Optional[str] = None
-    ):
+    ) -> Optional[str]:
         """
-        Tag recently created nodes with source metadata
-        This helps track which nodes came from which source
+        Look up a Document already built from identical content
+        On a hit the Document is re-tagged with the latest source URL/title
         """
         try:
-            with self.driver.session() as session:
-                # Find nodes created in the last minute and tag them
-                query = """
-                MATCH (n)
-                WHERE n.created_at IS NULL OR datetime(n.created_at) > datetime() - duration('PT1M')
-                SET n.source_url = $source_url,
-                    n.source_type = $source_type,
-                    n.source_title = $title,
-                    n.created_at = coalesce(n.created_at, datetime())
-                RETURN count(n) as tagged_count
-                """
-                result = session.run(query, source_url=source_url, source_type=source_type, title=title)
-                record = result.single()
-                if record:
-                    logger.info(f"   → Tagged {record['tagged_count']} nodes with source: {source_url}")
+            async with self.async_driver.session(database=self._db) as session:
+                await self._ensure_schema(session)
+                result = await session.run(f"""
+                    MATCH (d:{DOCUMENT_LABEL} {{content_hash: $content_hash}})
+                    WITH d LIMIT 1
+                    SET d.source_url = $source_url,
+                        d.source_title = $title
+                    RETURN elementId(d) AS id
+                """, content_hash=content_hash, source_url=source_url, title=title)
+                record = await result.single()
+                return record["id"] if record else None
         except Exception as e:
-            logger.warning(f"Failed to tag nodes with source: {e}")
-
+            logger.warning(f"Duplicate content lookup failed: {e}")
+            return None
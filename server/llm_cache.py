@@ -0,0 +1,172 @@
+"""
+Response cache for LLM calls
+Exact-match LRU keyed by prompt hash, with an optional semantic fallback
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[str], List[float]]
+
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# int8-quantized ONNX export shipped in the MiniLM model repo (uses AVX-512 VNNI when available)
+LOCAL_EMBEDDING_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+def load_local_embedder(model_name: str = LOCAL_EMBEDDING_MODEL) -> Optional[Embedder]:
+    """Load a local sentence embedder so semantic lookups need no API round-trip.
+
+    Prefers the quantized ONNX build and falls back to the regular model.
+    Returns None when sentence-transformers is not installed.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("sentence-transformers not installed; semantic LLM cache disabled")
+        return None
+
+    try:
+        model = SentenceTransformer(
+            model_name,
+            backend="onnx",
+            model_kwargs={"file_name": LOCAL_EMBEDDING_ONNX_FILE}
+        )
+    except Exception as e:
+        logger.warning(f"Quantized ONNX embedder unavailable ({e}); loading {model_name} as-is")
+        model = SentenceTransformer(model_name)
+
+    def embed(text: str) -> List[float]:
+        return model.encode(text, normalize_embeddings=True).tolist()
+
+    logger.info(f"✓ Local embedder loaded for semantic LLM cache: {model_name}")
+    return embed
+
+
+class ResponseCache:
+    """Two-tier cache for provider responses.
+
+    The exact tier is an LRU keyed by ``sha1(model + system + prompt)``.
+    When an ``embedder`` is supplied and the caller names the variable part of
+    the prompt (``query``), misses fall back to a cosine-similarity scan over
+    recently cached queries sharing the same model, system prompt and the rest
+    of the prompt. Only the query is embedded, so long page or conversation
+    context cannot push it past the embedder's token window. Embeddings are
+    computed in a worker thread, so lookups are awaitable.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.95
+    ):
+        self.max_size = max_size
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        # namespace -> list of (unit embedding, exact key)
+        self._vectors: dict = {}
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str) -> str:
+        """Build the exact-match key for a provider call"""
+        digest = hashlib.sha1()
+        for part in (model, system, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _namespace(model: str, system: str, prompt: str, query: str) -> str:
+        """Hash everything but the query so semantic matches share context and template"""
+        digest = hashlib.sha1()
+        for part in (model, system, prompt.replace(query, "", 1)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    async def get(self, model: str, system: str, prompt: str, query: Optional[str] = None) -> Optional[str]:
+        """Return a cached response, or None on miss"""
+        if self.max_size <= 0:
+            return None
+
+        key = self.make_key(model, system, prompt)
+        cached = self._exact.get(key)
+        if cached is not None:
+            self._exact.move_to_end(key)
+            logger.info("   → LLM cache hit (exact)")
+            return cached
+
+        if not self.embedder or not query:
+            return None
+
+        vector = await self._embed(query)
+        if vector is None:
+            return None
+        match_key, score = self._nearest(self._namespace(model, system, prompt, query), vector)
+        if match_key is not None and score >= self.similarity_threshold:
+            cached = self._exact.get(match_key)
+            if cached is not None:
+                self._exact.move_to_end(match_key)
+                logger.info(f"   → LLM cache hit (semantic, cosine={score:.3f})")
+                return cached
+        return None
+
+    async def set(self, model: str, system: str, prompt: str, response: str, query: Optional[str] = None):
+        """Store a provider response"""
+        if self.max_size <= 0 or not response:
+            return
+
+        key = self.make_key(model, system, prompt)
+        self._exact[key] = response
+        self._exact.move_to_end(key)
+
+        if self.embedder and query:
+            vector = await self._embed(query)
+            if vector is not None:
+                entries = self._vectors.setdefault(self._namespace(model, system, prompt, query), [])
+                entries[:] = [(v, k) for v, k in entries if k != key]
+                entries.append((vector, key))
+
+        while len(self._exact) > self.max_size:
+            evicted, _ = self._exact.popitem(last=False)
+            self._drop_vector(evicted)
+
+    def clear(self):
+        self._exact.clear()
+        self._vectors.clear()
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        # Model inference is CPU-bound; keep it off the event loop
+        try:
+            vector = list(await asyncio.to_thread(self.embedder, text))
+        except Exception as e:
+            logger.warning(f"Embedding for LLM cache failed: {e}")
+            return None
+        norm = math.sqrt(sum(x * x for x in vector))
+        if not norm:
+            return None
+        return [x / norm for x in vector]
+
+    def _nearest(self, namespace: str, vector: List[float]) -> Tuple[Optional[str], float]:
+        best_key, best_score = None, -1.0
+        for candidate, key in self._vectors.get(namespace, ()):
+            score = sum(a * b for a, b in zip(candidate, vector))
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key, best_score
+
+    def _drop_vector(self, key: str):
+        for namespace, entries in list(self._vectors.items()):
+            entries[:] = [(v, k) for v, k in entries if k != key]
+            if not entries:
+                del self._vectors[namespace]
@@ -3,27 +3,271 @@ LLM service for message rewriting
 Supports OpenAI and Anthropic models
 """
 
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import openai
 import anthropic
+import httpx
 import asyncio
+import functools
 import logging
+import random
+import re
 import time
 import json
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from llm_cache import Embedder, ResponseCache
+from rate_limiter import RateLimiter
+
 logger = logging.getLogger(__name__)
 
+OPENAI_SYSTEM_PROMPT = "You are a writing assistant. Rewrite the user's message EXACTLY as requested. Output ONLY the rewritten message - no explanations, no notes, no suggestions."
+ANTHROPIC_SYSTEM_PROMPT = "You are a writing assistant. Rewrite the user's message EXACTLY as requested. Output ONLY the rewritten message - no explanations, no notes, no suggestions, no extra formatting."
+
+# Short, context-free Claude rewrites are served by Haiku (3-5x faster than Sonnet/Opus)
+FAST_CLAUDE_MODEL = "claude-3-haiku-20240307"
+FAST_ROUTING_MAX_PROMPT_CHARS = 800
+
+# rewrite_messages_batch packs up to this many drafts into one provider call
+BATCH_MAX_PROMPTS = 8
+BATCH_MAX_TOKENS_PER_ITEM = 300
+
+# Page content budget for the summarizer prompt; the char limit applies without tiktoken
+SUMMARIZER_MAX_CONTENT_TOKENS = 3000
+SUMMARIZER_MAX_CONTENT_CHARS = 4000
+
+# Pages longer than 2 * SUMMARY_CHUNK_CHARS are summarized map-reduce style:
+# chunks go to the provider's cheaper model, then one call combines the partial summaries.
+# At most SUMMARY_MAX_SECTIONS chunks, evenly strided over the page, are summarized.
+SUMMARY_CHUNK_CHARS = 6000
+SUMMARY_MAX_SECTIONS = 8
+SUMMARY_MAP_QUESTION = "Summarize this section."
+SUMMARY_MAP_MODELS = {
+    "anthropic": FAST_CLAUDE_MODEL,
+    "openai": "gpt-4o-mini",
+}
+
+# Transient provider failures are retried with exponential backoff and full jitter
+RETRY_MAX_ATTEMPTS = 5
+RETRY_MIN_WAIT = 1.0
+RETRY_MAX_WAIT = 30.0
+RETRYABLE_PROVIDER_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    anthropic.RateLimitError,
+    anthropic.APIConnectionError,
+    anthropic.InternalServerError,
+)
+
+# Lines containing any of these start a trailing notes/suggestions section
+_STOP_MARKERS = (
+    '---',
+    '**note:**',
+    'note:',
+    'feel free to',
+    'you can also',
+    'suggestions:',
+    'tips:',
+    'remember to',
+    'don\'t forget',
+    'consider adding'
+)
+_STOP_MARKER_RE = re.compile('|'.join(re.escape(m) for m in _STOP_MARKERS), re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r'\[.*?\]')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+# (platform, tone) -> fallback rewrite template; tone None is the platform default
+_FALLBACK_TEMPLATES = {
+    ("linkedin", "friendly"): "Just to share heads-up: {body}",
+    ("linkedin", None): "Following up: {body}",
+}
+# Leading ```json / ``` and trailing ``` around a model's JSON answer
+_CODE_FENCE_RE = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+
+
+@functools.lru_cache(maxsize=128)
+def _normalize_model_name(model: str) -> str:
+    """Normalize model name to handle common variations"""
+    model_lower = model.lower()
+
+    if model_lower == "fallback":
+        return "fallback"
+    if "claude-sonnet-4" in model_lower:
+        return "claude-sonnet-4-5-20250929"
+
+    # Handle Claude model variations
+    if "claude" in model_lower:
+        if "opus" in model_lower:
+            return "claude-3-opus-20240229"
+        elif "sonnet" in model_lower:
+            return "claude-3-sonnet-20240229"
+        elif "haiku" in model_lower:
+            return "claude-3-haiku-20240307"
+        else:
+            # Default to haiku (fastest) if just "claude" is specified
+            return "claude-3-haiku-20240307"
+
+    # Return as-is for other models
+    return model
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve_provider(model: str) -> Optional[str]:
+    """Map a normalized model name to the provider that serves it"""
+    if model.startswith("gpt") or model.startswith("o1"):
+        return "openai"
+    if model.startswith("claude"):
+        return "anthropic"
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """
+    Shared tokenizer; cl100k_base also serves as a proxy for Claude token counts
+    Returns None without tiktoken or when the encoding cannot be loaded (it is
+    downloaded on first use), and the miss is cached so requests don't retry it
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({e}); truncating by characters")
+        return None
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Trim text to at most max_tokens tokens
+    Without a tokenizer the summarizer budget maps to SUMMARIZER_MAX_CONTENT_CHARS, scaled for other budgets
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:SUMMARIZER_MAX_CONTENT_CHARS * max_tokens // SUMMARIZER_MAX_CONTENT_TOKENS]
+    # No token spans more than a handful of characters, so skip encoding the tail of huge pages
+    text = text[:max_tokens * 8]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def _log_prompt(label: str, prompt: str):
+    """Dump a prompt in one DEBUG record; formatting is skipped when DEBUG is off"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("   → %s (%d chars):\n%s", label, len(prompt), prompt)
+
+
+class _ResponseCleaner:
+    """
+    Incremental form of LLMService._clean_response
+    Text is released one finished line at a time: everything from the first
+    stop-marker line on is dropped, placeholders are stripped, and runs of
+    blank lines collapse to one
+    """
+
+    def __init__(self):
+        self.stopped = False
+        self._buffer = ""
+        self._started = False
+        self._blank_pending = False
+
+    def feed(self, text: str) -> str:
+        """Add raw text and return the cleaned text of any lines it completes"""
+        if self.stopped:
+            return ""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return "".join(self._line(line) for line in lines if not self.stopped)
+
+    def finish(self) -> str:
+        """Return the cleaned text of the trailing unfinished line"""
+        if self.stopped:
+            return ""
+        line, self._buffer = self._buffer, ""
+        return self._line(line)
+
+    def _line(self, line: str) -> str:
+        if _STOP_MARKER_RE.search(line):
+            self.stopped = True
+            return ""
+        line = _PLACEHOLDER_RE.sub('', line).rstrip()
+        if not line.strip():
+            self._blank_pending = self._started
+            return ""
+        if not self._started:
+            self._started = True
+            return line.lstrip()
+        separator = "\n\n" if self._blank_pending else "\n"
+        self._blank_pending = False
+        return separator + line
+
+
+def _cached_completion(system_prompt: str):
+    """Serve provider calls from the service's response cache when possible"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(
+            self, prompt: str, model: str, skip_cache: bool = False, cache_query: Optional[str] = None, **kwargs
+        ) -> str:
+            if not skip_cache:
+                cached = await self.response_cache.get(model, system_prompt, prompt, query=cache_query)
+                if cached is not None:
+                    return cached
+            result = await func(self, prompt, model, **kwargs)
+            if not skip_cache:
+                await self.response_cache.set(model, system_prompt, prompt, result, query=cache_query)
+            return result
+        return wrapper
+    return decorator
+
 
 class LLMService:
-    def __init__(self, openai_key: Optional[str] = None, anthropic_key: Optional[str] = None):
+    def __init__(
+        self,
+        openai_key: Optional[str] = None,
+        anthropic_key: Optional[str] = None,
+        cache_size: int = 256,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.95,
+        max_concurrency: int = 8,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
         self.openai_key = openai_key
         self.anthropic_key = anthropic_key
+        # Caps in-flight provider calls so batch fan-out stays within RPM/TPM limits
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        # Preemptive throttle; 0 disables a limit
+        self._rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.response_cache = ResponseCache(
+            max_size=cache_size,
+            embedder=embedder,
+            similarity_threshold=similarity_threshold
+        )
         
+        # Native async clients share one HTTP connection pool per provider, or the
+        # caller's http_client (kept alive across requests) when one is given.
+        # SDK retries are off so _call_provider's backoff policy is the only one.
         if openai_key:
-            openai.api_key = openai_key
+            self.openai_client = openai.AsyncOpenAI(api_key=openai_key, max_retries=0, http_client=http_client)
+        else:
+            self.openai_client = None
         
         if anthropic_key:
-            self.anthropic_client = anthropic.Client(api_key=anthropic_key)
+            self.anthropic_client = anthropic.AsyncAnthropic(api_key=anthropic_key, max_retries=0, http_client=http_client)
         else:
             self.anthropic_client = None
     
@@ -31,30 +275,6 @@ class LLMService:
         """Check if at least one LLM provider is configured"""
         return bool(self.openai_key or self.anthropic_key)
     
-    def _normalize_model_name(self, model: str) -> str:
-        """Normalize model name to handle common variations"""
-        model_lower = model.lower()
-
-        if model_lower == "fallback":
-            return "fallback"
-        if "claude-sonnet-4" in model_lower:
-            return "claude-sonnet-4-5-20250929"
-        
-        # Handle Claude model variations
-        if "claude" in model_lower:
-            if "opus" in model_lower:
-                return "claude-3-opus-20240229"
-            elif "sonnet" in model_lower:
-                return "claude-3-sonnet-20240229"
-            elif "haiku" in model_lower:
-                return "claude-3-haiku-20240307"
-            else:
-                # Default to haiku (fastest) if just "claude" is specified
-                return "claude-3-haiku-20240307"
-        
-        # Return as-is for other models
-        return model
-    
     async def rewrite_message(
         self,
         user_input: str,
@@ -62,46 +282,200 @@ class LLMService:
         tone: str = "professional",
         platform: str = "linkedin",
         model: str = "gpt-4",
-        recipient: str = ""
+        recipient: str = "",
+        skip_cache: bool = False,
+        force_model: bool = False
     ) -> str:
         """
         Rewrite a message using the specified LLM model
+        Pass skip_cache=True to always hit the provider, and force_model=True
+        to opt out of routing short Claude rewrites to Haiku
+        """
+        rewritten, _ = await self.rewrite_message_with_status(
+            user_input, context, tone, platform, model, recipient, skip_cache, force_model
+        )
+        return rewritten
+    
+    async def rewrite_message_with_status(
+        self,
+        user_input: str,
+        context: str,
+        tone: str = "professional",
+        platform: str = "linkedin",
+        model: str = "gpt-4",
+        recipient: str = "",
+        skip_cache: bool = False,
+        force_model: bool = False
+    ) -> Tuple[str, bool]:
+        """
+        Rewrite a message, returning (text, degraded); degraded is True when the
+        deterministic fallback rewrite was used instead of a provider
         """
         if not user_input.strip():
-            return ""
+            return "", False
 
         if not self.is_available():
             logger.warning("No LLM provider configured. Falling back to deterministic rewrite.")
-            return self._fallback_rewrite(user_input, tone, platform, context)
+            return self._fallback_rewrite(user_input, tone, platform, context), True
         
         # Normalize model name
-        normalized_model = self._normalize_model_name(model)
+        normalized_model = _normalize_model_name(model)
         if normalized_model != model:
             logger.info(f"   → Model name normalized: '{model}' → '{normalized_model}'")
         model = normalized_model
 
         if model == "fallback":
-            return self._fallback_rewrite(user_input, tone, platform, context)
+            return self._fallback_rewrite(user_input, tone, platform, context), True
         
         # Build prompt
         prompt = self._build_prompt(user_input, context, tone, platform, recipient)
+        if not force_model:
+            model = self._route_rewrite_model(model, prompt, context)
         
         try:
             # Route to appropriate provider
-            if model.startswith("gpt") or model.startswith("o1"):
-                if not self.openai_key:
+            provider = _resolve_provider(model)
+            if provider == "openai":
+                if not self.openai_client:
                     raise Exception("OpenAI API key not configured")
-                return await self._rewrite_with_openai(prompt, model)
-            elif model.startswith("claude"):
+                rewritten = await self._rewrite_with_openai(
+                    prompt, model, skip_cache=skip_cache, cache_query=user_input
+                )
+            elif provider == "anthropic":
                 if not self.anthropic_client:
                     raise Exception("Anthropic API key not configured")
-                return await self._rewrite_with_anthropic(prompt, model)
+                rewritten = await self._rewrite_with_anthropic(
+                    prompt, model, skip_cache=skip_cache, cache_query=user_input
+                )
             else:
                 raise Exception(f"Unsupported model: {model}")
+            return rewritten, False
         except Exception as e:
             logger.error("LLM provider failed, using fallback rewrite", exc_info=True)
-            return self._fallback_rewrite(user_input, tone, platform, context)
+            return self._fallback_rewrite(user_input, tone, platform, context), True
     
+    async def rewrite_messages_batch(self, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Rewrite many messages, packing drafts for the same model into shared provider calls
+        Each item holds rewrite_message keyword arguments; results keep input order
+        """
+        results: List[Optional[str]] = [None] * len(items)
+        packed: Dict[str, List[int]] = {}
+        single: List[int] = []
+        for index, item in enumerate(items):
+            model = _normalize_model_name(item.get("model", "gpt-4"))
+            if self.is_available() and item.get("user_input", "").strip() and _resolve_provider(model):
+                packed.setdefault(model, []).append(index)
+            else:
+                single.append(index)
+
+        async def run_single(index: int):
+            results[index] = await self.rewrite_message(**items[index])
+
+        async def run_packed(model: str, indexes: List[int]):
+            rewritten = await self._rewrite_packed(model, [items[i] for i in indexes])
+            for index, text in zip(indexes, rewritten):
+                results[index] = text
+
+        tasks = [run_single(i) for i in single]
+        for model, indexes in packed.items():
+            for start in range(0, len(indexes), BATCH_MAX_PROMPTS):
+                chunk = indexes[start:start + BATCH_MAX_PROMPTS]
+                if len(chunk) == 1:
+                    tasks.append(run_single(chunk[0]))
+                else:
+                    tasks.append(run_packed(model, chunk))
+        await asyncio.gather(*tasks)
+        return results
+
+    async def _rewrite_packed(self, model: str, items: List[Dict[str, Any]]) -> List[str]:
+        """Rewrite several drafts in one provider call, falling back to per-item calls"""
+        prompts = [
+            self._build_prompt(
+                item["user_input"],
+                item.get("context", ""),
+                item.get("tone", "professional"),
+                item.get("platform", "linkedin"),
+                item.get("recipient", "")
+            )
+            for item in items
+        ]
+        sections = "\n\n".join(
+            f"### Draft {number}\n{prompt}" for number, prompt in enumerate(prompts, 1)
+        )
+        batch_prompt = (
+            f"Rewrite each of the following {len(prompts)} drafts, following each draft's own instructions. "
+            f"Return ONLY a JSON array of {len(prompts)} strings in the same order.\n\n{sections}"
+        )
+        max_tokens = BATCH_MAX_TOKENS_PER_ITEM * len(prompts)
+
+        try:
+            if _resolve_provider(model) == "openai":
+                response = await self._rewrite_with_openai(batch_prompt, model, raw=True, max_tokens=max_tokens)
+            else:
+                response = await self._rewrite_with_anthropic(batch_prompt, model, raw=True, max_tokens=max_tokens)
+            rewritten = _json_loads(_CODE_FENCE_RE.sub("", response.strip()))
+            if (
+                not isinstance(rewritten, list)
+                or len(rewritten) != len(items)
+                or not all(isinstance(text, str) for text in rewritten)
+            ):
+                raise ValueError(f"expected a JSON array of {len(items)} strings")
+            return [self._clean_response(text) for text in rewritten]
+        except Exception:
+            logger.warning("Packed rewrite failed; rewriting drafts individually", exc_info=True)
+            return await asyncio.gather(*(self.rewrite_message(**item) for item in items))
+
+    async def rewrite_message_stream(
+        self,
+        user_input: str,
+        context: str,
+        tone: str = "professional",
+        platform: str = "linkedin",
+        model: str = "gpt-4",
+        recipient: str = "",
+        skip_cache: bool = False,
+        force_model: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Stream a cleaned rewrite one line at a time as the provider produces it
+        Cache hits and fallback rewrites arrive as a single chunk
+        """
+        if not user_input.strip():
+            return
+
+        model = _normalize_model_name(model)
+        if not self.is_available() or model == "fallback":
+            yield self._fallback_rewrite(user_input, tone, platform, context)
+            return
+
+        prompt = self._build_prompt(user_input, context, tone, platform, recipient)
+        if not force_model:
+            model = self._route_rewrite_model(model, prompt, context)
+        produced = False
+        try:
+            async for chunk in self._stream_completion(
+                prompt, model, skip_cache=skip_cache, cache_query=user_input
+            ):
+                produced = True
+                yield chunk
+        except Exception:
+            logger.error("LLM stream failed", exc_info=True)
+            if not produced:
+                yield self._fallback_rewrite(user_input, tone, platform, context)
+
+    def _route_rewrite_model(self, model: str, prompt: str, context: str) -> str:
+        """Downgrade short rewrites without conversation context to the fast Claude model"""
+        if (
+            _resolve_provider(model) == "anthropic"
+            and model != FAST_CLAUDE_MODEL
+            and len(prompt) < FAST_ROUTING_MAX_PROMPT_CHARS
+            and not (context and context.strip())
+        ):
+            logger.info(f"   → Routing short rewrite from '{model}' to '{FAST_CLAUDE_MODEL}'")
+            return FAST_CLAUDE_MODEL
+        return model
+
     def _build_prompt(self, user_input: str, context: str, tone: str, platform: str, recipient: str = "") -> str:
         """Build the prompt for message rewriting"""
         
@@ -140,122 +514,248 @@ User's draft:
 
 Rewritten message (ONLY the message content, no extra notes or suggestions):"""
 
-        logger.info("   → Prompt being sent to LLM:")
-        logger.info("   " + "-" * 50)
-        for line in prompt.split('\n'):
-            logger.info(f"   {line}")
-        logger.info("   " + "-" * 50)
+        _log_prompt("Prompt", prompt)
 
         return prompt
     
-    async def _rewrite_with_openai(self, prompt: str, model: str) -> str:
-        """Rewrite using OpenAI API"""
+    async def _call_provider(self, prompt: str, max_tokens: int, request):
+        """
+        Await request() under the rate limiter and concurrency cap
+        Rate limits, connection errors and 5xx responses are retried with jittered backoff
+        """
+        estimated_tokens = len(prompt) // 4 + max_tokens
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            await self._rate_limiter.acquire(estimated_tokens)
+            try:
+                async with self._semaphore:
+                    return await request()
+            except RETRYABLE_PROVIDER_ERRORS as e:
+                await self._backoff(attempt, e)
+    
+    async def _open_stream(self, prompt: str, max_tokens: int, request):
+        """
+        Like _call_provider for a streaming request: only opening the stream is retried
+        The concurrency slot stays held on success; the caller releases it once the
+        stream has been consumed
+        """
+        estimated_tokens = len(prompt) // 4 + max_tokens
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            await self._rate_limiter.acquire(estimated_tokens)
+            await self._semaphore.acquire()
+            try:
+                return await request()
+            except RETRYABLE_PROVIDER_ERRORS as e:
+                self._semaphore.release()
+                await self._backoff(attempt, e)
+            except BaseException:
+                self._semaphore.release()
+                raise
+    
+    @staticmethod
+    async def _backoff(attempt: int, error: Exception):
+        """Sleep before retry attempt + 1 with full jitter, or re-raise after the last attempt"""
+        if attempt == RETRY_MAX_ATTEMPTS:
+            raise error
+        delay = random.uniform(0, min(RETRY_MAX_WAIT, RETRY_MIN_WAIT * 2 ** attempt))
+        logger.warning(
+            f"   → Provider call failed ({type(error).__name__}), "
+            f"retry {attempt}/{RETRY_MAX_ATTEMPTS - 1} in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+    
+    @_cached_completion(OPENAI_SYSTEM_PROMPT)
+    async def _rewrite_with_openai(
+        self,
+        prompt: str,
+        model: str,
+        raw: bool = False,
+        max_tokens: int = 500
+    ) -> str:
+        """Rewrite using OpenAI API; raw=True skips _clean_response"""
         try:
-            response = await asyncio.to_thread(
-                openai.chat.completions.create,
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a writing assistant. Rewrite the user's message EXACTLY as requested. Output ONLY the rewritten message - no explanations, no notes, no suggestions."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=500
+            response = await self._call_provider(
+                prompt,
+                max_tokens,
+                lambda: self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": OPENAI_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
             )
             
             result = response.choices[0].message.content.strip()
-            return self._clean_response(result)
+            return result if raw else self._clean_response(result)
             
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
     
-    async def _rewrite_with_anthropic(self, prompt: str, model: str) -> str:
-        """Rewrite using Anthropic Claude API"""
-        api_start = time.time()
+    @_cached_completion(ANTHROPIC_SYSTEM_PROMPT)
+    async def _rewrite_with_anthropic(
+        self,
+        prompt: str,
+        model: str,
+        cache_prefix: str = "",
+        raw: bool = False,
+        max_tokens: int = 300
+    ) -> str:
+        """
+        Rewrite using Anthropic Claude API; raw=True skips _clean_response
+        When cache_prefix is a leading slice of prompt, it is sent as a separate
+        ephemeral-cached block so follow-up turns reuse the provider's prefill
+        """
+        api_start = time.perf_counter()
         logger.info(f"   → Sending request to Anthropic API (model: {model})...")
         logger.info(f"   → Prompt length: {len(prompt)} characters")
         
-        # Use faster model if Sonnet is selected (Haiku is much faster)
-        if "sonnet" in model.lower():
-            # Suggest Haiku for faster responses, but allow override
-            logger.info(f"   → Tip: Using 'claude-3-haiku' would be 3-5x faster")
-        
         try:
-            api_call_start = time.time()
-            response = await asyncio.to_thread(
-                self.anthropic_client.messages.create,
-                model=model,
-                max_tokens=300,  # Reduced from 500 for faster responses
-                temperature=0.3,  # Lower temperature for faster, more consistent responses
-                system="You are a writing assistant. Rewrite the user's message EXACTLY as requested. Output ONLY the rewritten message - no explanations, no notes, no suggestions, no extra formatting.",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
+            api_call_start = time.perf_counter()
+            if cache_prefix and prompt.startswith(cache_prefix):
+                system = [{
+                    "type": "text",
+                    "text": ANTHROPIC_SYSTEM_PROMPT,
+                    "cache_control": {"type": "ephemeral"}
+                }]
+                content = [
+                    {"type": "text", "text": cache_prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": prompt[len(cache_prefix):]}
                 ]
+            else:
+                system = ANTHROPIC_SYSTEM_PROMPT
+                content = prompt
+
+            response = await self._call_provider(
+                prompt,
+                max_tokens,
+                lambda: self.anthropic_client.messages.create(
+                    model=model,
+                    max_tokens=max_tokens,  # 300 by default (reduced from 500 for faster responses)
+                    temperature=0.3,  # Lower temperature for faster, more consistent responses
+                    system=system,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": content
+                        }
+                    ]
+                )
             )
-            api_call_time = time.time() - api_call_start
+            api_call_time = time.perf_counter() - api_call_start
             logger.info(f"   → API call completed in {api_call_time:.2f}s")
             
             result = response.content[0].text.strip()
-            total_time = time.time() - api_start
+            total_time = time.perf_counter() - api_start
             logger.info(f"   → Response length: {len(result)} characters")
             logger.info(f"   → Total LLM processing time: {total_time:.2f}s")
             
-            return self._clean_response(result)
+            return result if raw else self._clean_response(result)
             
         except Exception as e:
-            error_time = time.time() - api_start
+            error_time = time.perf_counter() - api_start
             logger.error(f"   → API call failed after {error_time:.2f}s")
             logger.error(f"   → Error: {str(e)}")
             raise Exception(f"Anthropic API error: {str(e)}")
     
+    async def _stream_completion(
+        self,
+        prompt: str,
+        model: str,
+        skip_cache: bool = False,
+        cache_query: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield cleaned completion text from the provider serving model, one line at a time
+        The provider stream is closed at the first stop-marker line, and the streamed
+        text (identical to _clean_response of the full completion) is cached
+        """
+        provider = _resolve_provider(model)
+        if provider == "openai":
+            if not self.openai_client:
+                raise Exception("OpenAI API key not configured")
+            system_prompt = OPENAI_SYSTEM_PROMPT
+        elif provider == "anthropic":
+            if not self.anthropic_client:
+                raise Exception("Anthropic API key not configured")
+            system_prompt = ANTHROPIC_SYSTEM_PROMPT
+        else:
+            raise Exception(f"Unsupported model: {model}")
+
+        if not skip_cache:
+            cached = await self.response_cache.get(model, system_prompt, prompt, query=cache_query)
+            if cached is not None:
+                yield cached
+                return
+
+        cleaner = _ResponseCleaner()
+        chunks = []
+        if provider == "openai":
+            stream = await self._open_stream(
+                prompt,
+                500,
+                lambda: self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=500,
+                    stream=True
+                )
+            )
+        else:
+            stream = await self._open_stream(
+                prompt,
+                300,
+                lambda: self.anthropic_client.messages.create(
+                    model=model,
+                    max_tokens=300,
+                    temperature=0.3,
+                    system=system_prompt,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True
+                )
+            )
+        try:
+            async for event in stream:
+                if provider == "openai":
+                    delta = event.choices[0].delta.content if event.choices else None
+                else:
+                    delta = getattr(event.delta, "text", None) if event.type == "content_block_delta" else None
+                cleaned = cleaner.feed(delta) if delta else ""
+                if cleaned:
+                    chunks.append(cleaned)
+                    yield cleaned
+                if cleaner.stopped:
+                    break
+        finally:
+            await stream.response.aclose()
+            self._semaphore.release()
+
+        cleaned = cleaner.finish()
+        if cleaned:
+            chunks.append(cleaned)
+            yield cleaned
+
+        if not skip_cache:
+            await self.response_cache.set(model, system_prompt, prompt, "".join(chunks), query=cache_query)
+    
     def _clean_response(self, response: str) -> str:
         """Clean LLM response to remove extra notes, suggestions, or formatting"""
-        # Remove common patterns of extra content
-        lines = response.split('\n')
-        cleaned_lines = []
-        skip_rest = False
-        
-        for line in lines:
-            line_lower = line.lower().strip()
-            
-            # Stop if we hit common "note" or "suggestion" sections
-            if any(marker in line_lower for marker in [
-                '---',
-                '**note:**',
-                'note:',
-                'feel free to',
-                'you can also',
-                'suggestions:',
-                'tips:',
-                'remember to',
-                'don\'t forget',
-                'consider adding'
-            ]):
-                skip_rest = True
-                continue
-            
-            if not skip_rest:
-                cleaned_lines.append(line)
-        
-        result = '\n'.join(cleaned_lines).strip()
-        
-        # Remove placeholder brackets like [Name], [topic], etc.
-        import re
-        result = re.sub(r'\[.*?\]', '', result)
-        
-        # Clean up extra whitespace
-        result = re.sub(r'\n\s*\n\s*\n+', '\n\n', result)
-        result = result.strip()
-        
-        return result
+        # Keep everything up to the first "note" or "suggestion" section, drop
+        # placeholder brackets like [Name], [topic], and collapse blank lines.
+        # Shares _ResponseCleaner with streaming so both paths return the same text
+        cleaner = _ResponseCleaner()
+        return cleaner.feed(response) + cleaner.finish()
     
     def get_available_models(self) -> list:
         """Return list of available models based on configured API keys"""
@@ -287,23 +787,17 @@ Rewritten message (ONLY the message content, no extra notes or suggestions):"""
         if not text:
             return ""
 
-        # Basic sentence cleanup
-        sentences = [s.strip().capitalize() for s in text.replace('\n', ' ').split('.')]
-        sentences = [s for s in sentences if s]
-        rewritten_body = '. '.join(sentences)
-        if not rewritten_body:
-            rewritten_body = text.capitalize()
-        if rewritten_body and rewritten_body[-1] not in '.!?':
+        # Basic sentence cleanup: capitalize sentence starts, keep their punctuation
+        sentences = (sentence.strip() for sentence in _SENTENCE_SPLIT_RE.split(text.replace('\n', ' ')))
+        rewritten_body = ' '.join(
+            sentence if not sentence[0].islower() else sentence[0].upper() + sentence[1:]
+            for sentence in sentences if sentence
+        )
+        if rewritten_body[-1] not in '.!?':
             rewritten_body += '.'
 
-        if platform == "linkedin":
-            if tone == "friendly":
-                return f"Just to share heads-up: {rewritten_body}"
-            return f"Following up: {rewritten_body}"
-        elif platform == "gmail":
-            return rewritten_body
-        else:
-            return rewritten_body
+        template = _FALLBACK_TEMPLATES.get((platform, tone)) or _FALLBACK_TEMPLATES.get((platform, None), "{body}")
+        return template.format(body=rewritten_body)
 
     async def answer_question(
         self,
@@ -313,7 +807,8 @@ Rewritten message (ONLY the message content, no extra notes or suggestions):"""
         session_id: str = "default",
         page_title: Optional[str] = None,
         page_content: Optional[str] = None,
-        chat_history: str = ""
+        chat_history: str = "",
+        skip_cache: bool = False
     ) -> str:
         if not question.strip():
             return ""
@@ -322,7 +817,7 @@ Rewritten message (ONLY the message content, no extra notes or suggestions):"""
             logger.warning("LLM unavailable, using fallback answer.")
             return self._fallback_answer(question, knowledge_context)
 
-        normalized_model = self._normalize_model_name(model)
+        normalized_model = _normalize_model_name(model)
         
         # Determine if this is summarizer mode (has page_content) or regular chat
         is_summarizer = bool(page_content and page_title)
@@ -332,27 +827,141 @@ Rewritten message (ONLY the message content, no extra notes or suggestions):"""
         if normalized_model == "fallback":
             return self._fallback_answer(question, knowledge_context)
 
-        # Build appropriate prompt based on mode
-        if is_summarizer:
-            prompt = self._build_summarizer_prompt(question, page_content, page_title, chat_history)
-        else:
-            prompt = self._build_chat_prompt(question, knowledge_context, session_id)
-
         try:
-            if normalized_model.startswith("gpt") or normalized_model.startswith("o1"):
-                if not self.openai_key:
+            # Build appropriate prompt based on mode
+            cache_prefix = ""
+            if is_summarizer:
+                cache_prefix = self._build_summarizer_prefix(page_content, page_title)
+                prompt = self._build_summarizer_prompt(
+                    question, page_content, page_title, chat_history, prefix=cache_prefix
+                )
+            else:
+                prompt = self._build_chat_prompt(question, knowledge_context, session_id)
+
+            provider = _resolve_provider(normalized_model)
+            if provider == "openai":
+                if not self.openai_client:
                     raise Exception("OpenAI API key not configured")
-                return await self._rewrite_with_openai(prompt, normalized_model)
-            elif normalized_model.startswith("claude"):
+                return await self._rewrite_with_openai(
+                    prompt, normalized_model, skip_cache=skip_cache, cache_query=question
+                )
+            elif provider == "anthropic":
                 if not self.anthropic_client:
                     raise Exception("Anthropic API key not configured")
-                return await self._rewrite_with_anthropic(prompt, normalized_model)
+                return await self._rewrite_with_anthropic(
+                    prompt, normalized_model, skip_cache=skip_cache, cache_prefix=cache_prefix, cache_query=question
+                )
             else:
                 raise Exception(f"Unsupported model: {normalized_model}")
         except Exception:
             logger.error(f"{mode.capitalize()} LLM call failed; using fallback answer.", exc_info=True)
             return self._fallback_answer(question, knowledge_context)
 
+    async def answer_question_stream(
+        self,
+        question: str,
+        knowledge_context: str,
+        model: str = "fallback",
+        session_id: str = "default",
+        page_title: Optional[str] = None,
+        page_content: Optional[str] = None,
+        chat_history: str = "",
+        skip_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Stream a cleaned answer one line at a time as the provider produces it
+        The joined chunks equal what answer_question returns for the same prompt;
+        cache hits and fallback answers arrive as a single chunk
+        """
+        if not question.strip():
+            return
+
+        model = _normalize_model_name(model)
+        if not self.is_available() or model == "fallback":
+            yield self._fallback_answer(question, knowledge_context)
+            return
+
+        produced = False
+        try:
+            if page_content and page_title:
+                prompt = self._build_summarizer_prompt(question, page_content, page_title, chat_history)
+            else:
+                prompt = self._build_chat_prompt(question, knowledge_context, session_id)
+            async for chunk in self._stream_completion(
+                prompt, model, skip_cache=skip_cache, cache_query=question
+            ):
+                produced = True
+                yield chunk
+        except Exception:
+            logger.error("LLM answer stream failed", exc_info=True)
+            if not produced:
+                yield self._fallback_answer(question, knowledge_context)
+
+    async def summarize_page(
+        self,
+        question: str,
+        page_title: str,
+        page_content: str,
+        model: str = "fallback"
+    ) -> str:
+        """
+        Answer a summarizer question about a whole page
+        Long pages are split into chunks that are summarized concurrently first
+        """
+        normalized_model = _normalize_model_name(model)
+        provider = _resolve_provider(normalized_model)
+        if len(page_content) <= SUMMARY_CHUNK_CHARS * 2 or not self.is_available() or provider is None:
+            return await self.answer_question(
+                question=question,
+                knowledge_context="",
+                model=model,
+                session_id="summarizer",
+                page_title=page_title,
+                page_content=page_content,
+                chat_history=""
+            )
+
+        chunks = [
+            page_content[i:i + SUMMARY_CHUNK_CHARS]
+            for i in range(0, len(page_content), SUMMARY_CHUNK_CHARS)
+        ]
+        if len(chunks) > SUMMARY_MAX_SECTIONS:
+            stride = len(chunks) / SUMMARY_MAX_SECTIONS
+            chunks = [chunks[int(index * stride)] for index in range(SUMMARY_MAX_SECTIONS)]
+        map_model = SUMMARY_MAP_MODELS.get(provider, normalized_model)
+        logger.info(f"   → Long page ({len(page_content)} chars): summarizing {len(chunks)} sections with {map_model}")
+        partials = await asyncio.gather(*(
+            self.answer_question(
+                question=SUMMARY_MAP_QUESTION,
+                knowledge_context="",
+                model=map_model,
+                session_id="summarizer",
+                page_title=f"{page_title} (part {index}/{len(chunks)})",
+                page_content=chunk,
+                chat_history=""
+            )
+            for index, chunk in enumerate(chunks, 1)
+        ))
+
+        # Failed sections come back as the fallback answer; leave them out of the reduce step
+        failed = self._fallback_answer(SUMMARY_MAP_QUESTION, "")
+        partials = [partial for partial in partials if partial and partial != failed]
+        if not partials:
+            logger.warning("   → Every section summary failed; answering from the truncated page")
+            partials = [page_content]
+
+        # Split the reduce prompt's content budget between the partials so none is cut off entirely
+        budget = SUMMARIZER_MAX_CONTENT_TOKENS // len(partials)
+        return await self.answer_question(
+            question=question,
+            knowledge_context="",
+            model=model,
+            session_id="summarizer",
+            page_title=page_title,
+            page_content="\n\n".join(_truncate_to_tokens(partial, budget) for partial in partials),
+            chat_history=""
+        )
+
     async def extract_profile(
         self,
         profile_data: dict,
@@ -362,18 +971,19 @@ Rewritten message (ONLY the message content, no extra notes or suggestions):"""
         if not combined_text.strip():
             return self._fallback_profile_structure(profile_data, combined_text)
 
-        normalized_model = self._normalize_model_name(model)
+        normalized_model = _normalize_model_name(model)
         if not self.is_available() or normalized_model == "fallback":
             return self._fallback_profile_structure(profile_data, combined_text)
 
         prompt = self._build_profile_prompt(combined_text)
 
         try:
-            if normalized_model.startswith("gpt") or normalized_model.startswith("o1"):
-                if not self.openai_key:
+            provider = _resolve_provider(normalized_model)
+            if provider == "openai":
+                if not self.openai_client:
                     raise Exception("OpenAI API key not configured")
                 response = await self._rewrite_with_openai(prompt, normalized_model)
-            elif normalized_model.startswith("claude"):
+            elif provider == "anthropic":
                 if not self.anthropic_client:
                     raise Exception("Anthropic API key not configured")
                 response = await self._rewrite_with_anthropic(prompt, normalized_model)
@@ -388,6 +998,14 @@ Rewritten message (ONLY the message content, no extra notes or suggestions):"""
         structured.setdefault("raw_text", combined_text)
         return structured
 
+    async def extract_profiles_batch(
+        self,
+        profiles: List[dict],
+        model: str = "fallback"
+    ) -> List[dict]:
+        """Extract structured data for many profiles concurrently, preserving input order"""
+        return await asyncio.gather(*(self.extract_profile(profile, model=model) for profile in profiles))
+
     def _build_chat_prompt(self, question: str, knowledge_context: str, session_id: str = "default") -> str:
         """Build prompt for general knowledge graph chat"""
         prompt = """You are a highly personalized AI assistant. Your primary goal is to learn about the user and provide increasingly personalized help over time.
@@ -410,22 +1028,21 @@ PERSONALITY:
             prompt += "Knowledge graph snippets: (none)\n\n"
         prompt += f"User question: {question}\n\nAnswer:"
 
-        logger.info("   → Chat prompt being sent to LLM:")
-        logger.info("   " + "-" * 50)
-        for line in prompt.split("\n"):
-            logger.info(f"   {line}")
-        logger.info("   " + "-" * 50)
+        _log_prompt("Chat prompt", prompt)
 
         return prompt
     
-    def _build_summarizer_prompt(self, question: str, page_content: str, page_title: str, chat_history: str = "") -> str:
-        """Build prompt for page summarizer mode"""
-        prompt = f"""You are analyzing the webpage: "{page_title}"
+    def _build_summarizer_prefix(self, page_content: str, page_title: str) -> str:
+        """
+        Build the stable part of the summarizer prompt
+        It only depends on the page, so providers can cache it across questions
+        """
+        return f"""You are analyzing the webpage: "{page_title}"
 
 Your task is to answer questions about this specific page using ONLY the content provided below.
 
 Page Content:
-{page_content[:4000]}
+{_truncate_to_tokens(page_content, SUMMARIZER_MAX_CONTENT_TOKENS)}
 
 Guidelines:
 - If asked to "summarize", provide a clear, concise overview of the main points
@@ -435,17 +1052,24 @@ Guidelines:
 - If the answer isn't in the page, clearly state that
 - Keep responses focused and relevant
 """
+
+    def _build_summarizer_prompt(
+        self,
+        question: str,
+        page_content: str,
+        page_title: str,
+        chat_history: str = "",
+        prefix: Optional[str] = None
+    ) -> str:
+        """Build prompt for page summarizer mode, reusing an already built prefix if given"""
+        prompt = prefix if prefix is not None else self._build_summarizer_prefix(page_content, page_title)
         
         if chat_history:
             prompt += f"\n\nPrevious conversation:\n{chat_history}\n"
         
         prompt += f"\n\nUser's Question: {question}\n\nYour Response:"
         
-        logger.info("   → Summarizer prompt being sent to LLM:")
-        logger.info("   " + "-" * 50)
-        for line in prompt.split("\n")[:30]:  # Show first 30 lines
-            logger.info(f"   {line}")
-        logger.info("   " + "-" * 50)
+        _log_prompt("Summarizer prompt", prompt)
         
         return prompt
 
@@ -499,21 +1123,13 @@ Guidelines:
             f"Text:\n{combined_text}\n\n"
             "JSON:"
         )
-        logger.info("   → Profile extraction prompt:")
-        logger.info("   " + "-" * 50)
-        for line in prompt.split("\n"):
-            logger.info(f"   {line}")
-        logger.info("   " + "-" * 50)
+        _log_prompt("Profile extraction prompt", prompt)
         return prompt
 
     def _parse_profile_json(self, response_text: str, original_data: dict, combined_text: str) -> dict:
         try:
-            json_text = response_text.strip()
-            if json_text.startswith("```"):
-                json_text = json_text.strip("`")
-                if "\n" in json_text:
-                    json_text = json_text.split("\n", 1)[1]
-            data = json.loads(json_text)
+            json_text = _CODE_FENCE_RE.sub("", response_text.strip())
+            data = _json_loads(json_text)
         except Exception:
             logger.error("Failed to parse profile JSON", exc_info=True)
             return self._fallback_profile_structure(original_data, combined_text)
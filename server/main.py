@@ -4,16 +4,23 @@ Handles message rewriting with RAG using Neo4j
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import ENCODERS_BY_TYPE
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Set
 import os
 import time
 import logging
-from pathlib import Path
 import sys
 import asyncio
+import hashlib
+import httpx
 
+import orjson
+import neo4j.time
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # CRITICAL: Set Windows event loop policy BEFORE importing parsing (which imports Playwright)
@@ -22,7 +29,8 @@ if sys.platform.startswith("win"):
 
 from neo4j_service import Neo4jService
 from llm_service import LLMService
-from parsing import run_parsing
+from llm_cache import load_local_embedder
+from parsing import run_parsing, close_crawler
 from supermemory_uploader import upload_markdown_to_supermemory
 from supermemory_service import SuperMemoryService
 from kg_pipeline import KGPipelineService
@@ -38,7 +46,40 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="AI Message Composer API", version="1.0.0")
+# Bound once; the model used when a request doesn't pick one
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "fallback")
+
+
+def _json_default(obj):
+    """orjson fallback for the neo4j.time values returned by Neo4jService"""
+    iso_format = getattr(obj, "iso_format", None)
+    if iso_format is None:
+        raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+    return iso_format()
+
+
+class ApiJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also formats Neo4j temporal values"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+        )
+
+
+# Endpoints that return plain dicts go through jsonable_encoder before the response
+# class renders them, so it needs the same neo4j.time formatting as _json_default
+for _neo4j_time_type in (neo4j.time.DateTime, neo4j.time.Date, neo4j.time.Time, neo4j.time.Duration):
+    ENCODERS_BY_TYPE[_neo4j_time_type] = _neo4j_time_type.iso_format
+
+
+app = FastAPI(
+    title="AI Message Composer API",
+    version="1.0.0",
+    default_response_class=ApiJSONResponse
+)
 
 # CORS middleware for Chrome extension
 app.add_middleware(
@@ -53,7 +94,9 @@ app.add_middleware(
 neo4j_service = Neo4jService(
     uri=os.getenv("NEO4J_URI", "bolt://localhost:7687"),
     user=os.getenv("NEO4J_USER", "neo4j"),
-    password=os.getenv("NEO4J_PASSWORD", "password")
+    password=os.getenv("NEO4J_PASSWORD", "password"),
+    database=os.getenv("NEO4J_DATABASE", "neo4j"),
+    pool_size=int(os.getenv("NEO4J_POOL", "50"))
 )
 
 supermemory_service = SuperMemoryService(
@@ -61,23 +104,96 @@ supermemory_service = SuperMemoryService(
     container=os.getenv("SUPERMEMORY_CONTAINER", "ai-composer")
 )
 
+# One keep-alive HTTP/2 pool shared by both LLM provider clients; closed on shutdown
+llm_http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+)
+
+# Local MiniLM embedder, shared by the semantic LLM cache and message embeddings
+LLM_SEMANTIC_CACHE = os.getenv("LLM_SEMANTIC_CACHE", "False").lower() == "true"
+MESSAGE_EMBEDDINGS = os.getenv("MESSAGE_EMBEDDINGS", "False").lower() == "true"
+local_embedder = load_local_embedder() if LLM_SEMANTIC_CACHE or MESSAGE_EMBEDDINGS else None
+
 llm_service = LLMService(
     openai_key=os.getenv("OPENAI_API_KEY"),
-    anthropic_key=os.getenv("ANTHROPIC_API_KEY")
+    anthropic_key=os.getenv("ANTHROPIC_API_KEY"),
+    cache_size=int(os.getenv("LLM_CACHE_SIZE", 256)),
+    embedder=local_embedder if LLM_SEMANTIC_CACHE else None,
+    similarity_threshold=float(os.getenv("LLM_CACHE_SIMILARITY", 0.95)),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+    requests_per_minute=int(os.getenv("LLM_RPM_LIMIT", 0)),
+    tokens_per_minute=int(os.getenv("LLM_TPM_LIMIT", 0)),
+    http_client=llm_http_client
 )
 
+# Finished provider rewrites keyed on the full request fingerprint; retries of an
+# unchanged message return without another LLM round-trip. Fallback rewrites are
+# never stored, so a provider outage isn't replayed from the cache
+_rewrite_cache = TTLCache(
+    maxsize=int(os.getenv("REWRITE_CACHE_SIZE", 1024)),
+    ttl=int(os.getenv("REWRITE_CACHE_TTL", 600))
+)
+
+# DOM-scraped profile fields rendered as "**Label:** value" lines
+PROFILE_FIELDS = (("Name", "name"), ("Headline", "headline"), ("Location", "location"))
+
+# (heading, list key, entry title key, default title, entry fields)
+PROFILE_SECTIONS = (
+    ("Experience", "experience", "title", "Position", (("Company", "company"), ("Duration", "duration"))),
+    ("Education", "education", "school", "School", (("Degree", "degree"), ("Years", "years"))),
+)
+
+# Character budgets for page and profile content in the chat knowledge context
+PAGE_CONTENT_CAP = 2000
+PROFILE_CONTENT_CAP = 1500
+
+# Separator line for the request/startup log sections
+BANNER = "=" * 60
+
+# Last /health probe result, so frequent probes don't each hit Neo4j and SuperMemory
+HEALTH_CACHE_TTL = 5.0
+_health_cache = {"ts": float("-inf"), "val": None}
+
+# Fire-and-forget work; strong references keep tasks alive and shutdown waits for them
+background_tasks: Set[asyncio.Task] = set()
+
 # Initialize KG Pipeline (will be configured in startup)
 kg_pipeline_service = None
 
 
+async def _none():
+    """Placeholder awaitable for optional branches of asyncio.gather"""
+    return None
+
+
+def spawn(coro) -> asyncio.Task:
+    """Run coro in the background, tracked in background_tasks until it finishes"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def _sse(payload: dict) -> str:
+    """Format one server-sent event"""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
 # Pydantic models
-class ConversationMessage(BaseModel):
+class ApiModel(BaseModel):
+    """Base for request/response bodies; unknown fields are dropped without building an extras dict"""
+    model_config = ConfigDict(extra="ignore")
+
+
+class ConversationMessage(ApiModel):
     text: str
     is_outgoing: bool
     timestamp: str
 
 
-class RewriteRequest(BaseModel):
+class RewriteRequest(ApiModel):
     platform: str
     user_input: str
     conversation_context: List[ConversationMessage]
@@ -86,7 +202,7 @@ class RewriteRequest(BaseModel):
     model: Optional[str] = None
 
 
-class StoreConversationRequest(BaseModel):
+class StoreConversationRequest(ApiModel):
     platform: str
     recipient: str
     message: str
@@ -94,21 +210,21 @@ class StoreConversationRequest(BaseModel):
     timestamp: str
 
 
-class RewriteResponse(BaseModel):
+class RewriteResponse(ApiModel):
     rewritten_message: str
     original_message: str
     context_used: bool
     rag_context: Optional[str] = None
 
 
-class StoreProfileRequest(BaseModel):
+class StoreProfileRequest(ApiModel):
     platform: str
     profile_url: str
     profile_data: Optional[dict] = None
     cookies: Optional[List[dict]] = None  # Browser cookies for authenticated scraping
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(ApiModel):
     question: str
     platform: Optional[str] = None
     recipient: Optional[str] = None
@@ -116,26 +232,57 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = "default"
 
 
-class ChatResponse(BaseModel):
+class ChatResponse(ApiModel):
     answer: str
     context_used: bool
 
 
-class SummarizeRequest(BaseModel):
+class SummarizeRequest(ApiModel):
     url: str
     title: Optional[str] = None
     cookies: Optional[List[dict]] = None  # Browser cookies for authenticated scraping
 
 
+def _build_rewrite_context(request: RewriteRequest, rag_context: List[dict]) -> str:
+    """Format stored history and the live conversation for the rewrite prompt"""
+    parts = []
+    if rag_context:
+        parts.append("Previous conversation history:")
+        parts.extend(f"{'You' if m['is_outgoing'] else request.recipient}: {m['message']}" for m in rag_context)
+    
+    # Add current conversation context
+    if request.conversation_context:
+        parts.append("\nCurrent conversation:")
+        parts.extend(f"{'You' if m.is_outgoing else request.recipient}: {m.text}" for m in request.conversation_context)
+    return "\n".join(parts)
+
+
+def _rewrite_cache_key(request: RewriteRequest, model: str, context_str: str) -> bytes:
+    return hashlib.blake2b(
+        f"{request.platform}|{request.recipient}|{request.tone}|{model}|{request.user_input}|{context_str}".encode(),
+        digest_size=16
+    ).digest()
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {
+    """Health check endpoint; probe results are reused for HEALTH_CACHE_TTL seconds"""
+    if time.monotonic() - _health_cache["ts"] < HEALTH_CACHE_TTL:
+        return _health_cache["val"]
+    
+    neo4j_ok, supermemory_ok = await asyncio.gather(
+        asyncio.to_thread(neo4j_service.test_connection),
+        supermemory_service.test_connection()
+    )
+    health = {
         "status": "healthy",
-        "neo4j_connected": neo4j_service.test_connection(),
-        "supermemory_connected": supermemory_service.test_connection(),
+        "neo4j_connected": neo4j_ok,
+        "supermemory_connected": supermemory_ok,
         "llm_available": llm_service.is_available()
     }
+    _health_cache["ts"] = time.monotonic()
+    _health_cache["val"] = health
+    return health
 
 
 @app.post("/api/rewrite", response_model=RewriteResponse)
@@ -144,69 +291,65 @@ async def rewrite_message(request: RewriteRequest):
     Rewrite a message using AI with RAG context from Neo4j
     """
     start_time = time.time()
-    logger.info("=" * 60)
-    logger.info(f"📝 REWRITE REQUEST RECEIVED")
-    logger.info(f"   Platform: {request.platform}")
-    logger.info(f"   Recipient: {request.recipient}")
-    logger.info(f"   User Input: {request.user_input[:50]}..." if len(request.user_input) > 50 else f"   User Input: {request.user_input}")
-    logger.info(f"   Tone: {request.tone}")
-    logger.info(f"   Model: {request.model or os.getenv('DEFAULT_MODEL', 'fallback')}")
+    logger.debug(BANNER)
+    logger.info("📝 REWRITE REQUEST RECEIVED")
+    logger.info("   Platform: %s", request.platform)
+    logger.info("   Recipient: %s", request.recipient)
+    logger.info("   User Input: %s%s", request.user_input[:50], "..." if len(request.user_input) > 50 else "")
+    logger.info("   Tone: %s", request.tone)
+    model = request.model or DEFAULT_MODEL
+    logger.info("   Model: %s", model)
     
     try:
         # Step 1: Retrieve relevant past conversations from Neo4j
         neo4j_start = time.time()
         logger.info("🔍 Step 1: Querying Neo4j for conversation history...")
-        rag_context = neo4j_service.get_conversation_history(
+        rag_context = await asyncio.to_thread(
+            neo4j_service.get_conversation_history,
             recipient=request.recipient,
             platform=request.platform,
             limit=10
         )
         neo4j_time = time.time() - neo4j_start
-        logger.info(f"   ✓ Neo4j query completed in {neo4j_time:.2f}s")
-        logger.info(f"   ✓ Found {len(rag_context)} past messages")
+        logger.info("   ✓ Neo4j query completed in %.2fs", neo4j_time)
+        logger.info("   ✓ Found %s past messages", len(rag_context))
         
         # Step 2: Build context string
         context_start = time.time()
         logger.info("📋 Step 2: Building context string...")
-        context_str = ""
-        if rag_context:
-            context_str = "Previous conversation history:\n"
-            for msg in rag_context:
-                direction = "You" if msg["is_outgoing"] else request.recipient
-                context_str += f"{direction}: {msg['message']}\n"
-        
-        # Add current conversation context
-        if request.conversation_context:
-            context_str += "\nCurrent conversation:\n"
-            for msg in request.conversation_context:
-                direction = "You" if msg.is_outgoing else request.recipient
-                context_str += f"{direction}: {msg.text}\n"
+        context_str = _build_rewrite_context(request, rag_context)
         context_time = time.time() - context_start
-        logger.info(f"   ✓ Context built in {context_time:.2f}s")
-        logger.info(f"   ✓ Context length: {len(context_str)} characters")
+        logger.info("   ✓ Context built in %.2fs", context_time)
+        logger.info("   ✓ Context length: %s characters", len(context_str))
         
         # Step 3: Rewrite message using LLM
         llm_start = time.time()
-        model = request.model or os.getenv("DEFAULT_MODEL", "fallback")
-        logger.info(f"🤖 Step 3: Calling LLM ({model})...")
-        logger.info(f"   This may take 2-8 seconds depending on model...")
-        rewritten = await llm_service.rewrite_message(
-            user_input=request.user_input,
-            context=context_str,
-            tone=request.tone,
-            platform=request.platform,
-            model=model,
-            recipient=request.recipient
-        )
+        logger.info("🤖 Step 3: Calling LLM (%s)...", model)
+        cache_key = _rewrite_cache_key(request, model, context_str)
+        rewritten = _rewrite_cache.get(cache_key)
+        if rewritten is not None:
+            logger.info("   → Rewrite cache hit")
+        else:
+            logger.info("   This may take 2-8 seconds depending on model...")
+            rewritten, degraded = await llm_service.rewrite_message_with_status(
+                user_input=request.user_input,
+                context=context_str,
+                tone=request.tone,
+                platform=request.platform,
+                model=model,
+                recipient=request.recipient
+            )
+            if rewritten and not degraded:
+                _rewrite_cache[cache_key] = rewritten
         llm_time = time.time() - llm_start
-        logger.info(f"   ✓ LLM response received in {llm_time:.2f}s")
-        logger.info(f"   ✓ Rewritten message length: {len(rewritten)} characters")
+        logger.info("   ✓ LLM response received in %.2fs", llm_time)
+        logger.info("   ✓ Rewritten message length: %s characters", len(rewritten))
         
         total_time = time.time() - start_time
-        logger.info(f"✅ REQUEST COMPLETED")
-        logger.info(f"   Total time: {total_time:.2f}s")
-        logger.info(f"   Breakdown: Neo4j={neo4j_time:.2f}s, Context={context_time:.2f}s, LLM={llm_time:.2f}s")
-        logger.info("=" * 60)
+        logger.info("✅ REQUEST COMPLETED")
+        logger.info("   Total time: %.2fs", total_time)
+        logger.info("   Breakdown: Neo4j=%.2fs, Context=%.2fs, LLM=%.2fs", neo4j_time, context_time, llm_time)
+        logger.debug(BANNER)
         
         return RewriteResponse(
             rewritten_message=rewritten,
@@ -217,12 +360,56 @@ async def rewrite_message(request: RewriteRequest):
         
     except Exception as e:
         total_time = time.time() - start_time
-        logger.error(f"❌ ERROR after {total_time:.2f}s: {str(e)}")
-        logger.error(f"   Error type: {type(e).__name__}")
+        logger.error("❌ ERROR after %.2fs: %s", total_time, e)
+        logger.error("   Error type: %s", type(e).__name__)
         import traceback
-        logger.error(f"   Traceback:\n{traceback.format_exc()}")
-        logger.info("=" * 60)
+        logger.error("   Traceback:\n%s", traceback.format_exc())
+        logger.debug(BANNER)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/rewrite/stream")
+async def rewrite_message_stream(request: RewriteRequest):
+    """
+    Same as /api/rewrite, but streams the rewrite as server-sent events
+    Emits {"delta": text} chunks followed by a final {"done": true, ...} event
+    """
+    try:
+        rag_context = await asyncio.to_thread(
+            neo4j_service.get_conversation_history,
+            recipient=request.recipient,
+            platform=request.platform,
+            limit=10
+        )
+    except Exception as e:
+        logger.error("Streaming rewrite failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    context_str = _build_rewrite_context(request, rag_context)
+    model = request.model or DEFAULT_MODEL
+    cached = _rewrite_cache.get(_rewrite_cache_key(request, model, context_str))
+    
+    async def events():
+        if cached is not None:
+            logger.info("   → Rewrite cache hit")
+            yield _sse({"delta": cached})
+        else:
+            async for chunk in llm_service.rewrite_message_stream(
+                user_input=request.user_input,
+                context=context_str,
+                tone=request.tone,
+                platform=request.platform,
+                model=model,
+                recipient=request.recipient
+            ):
+                yield _sse({"delta": chunk})
+        yield _sse({
+            "done": True,
+            "context_used": bool(rag_context or request.conversation_context),
+            "rag_context": context_str or None
+        })
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @app.post("/api/store-conversation")
@@ -231,16 +418,23 @@ async def store_conversation(request: StoreConversationRequest):
     Store a conversation message in Neo4j (structured data) for future RAG retrieval
     """
     try:
+        # Embed for related-message search when enabled
+        embedding = None
+        if MESSAGE_EMBEDDINGS and local_embedder:
+            embedding = await asyncio.to_thread(local_embedder, request.message)
+        
         # Store in Neo4j as structured data
-        neo4j_service.store_message(
+        await asyncio.to_thread(
+            neo4j_service.store_message,
             platform=request.platform,
             recipient=request.recipient,
             message=request.message,
             is_outgoing=request.is_outgoing,
-            timestamp=request.timestamp
+            timestamp=request.timestamp,
+            embedding=embedding
         )
         
-        logger.info(f"✓ Message stored in Neo4j: {request.recipient}")
+        logger.info("✓ Message stored in Neo4j: %s", request.recipient)
         
         return {
             "status": "success",
@@ -248,7 +442,7 @@ async def store_conversation(request: StoreConversationRequest):
         }
         
     except Exception as e:
-        logger.error(f"Failed to store conversation: {e}")
+        logger.error("Failed to store conversation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -258,13 +452,15 @@ async def get_conversation_history(recipient: str, platform: str = "linkedin", l
     Retrieve conversation history for a recipient
     """
     try:
-        history = neo4j_service.get_conversation_history(
+        history = await asyncio.to_thread(
+            neo4j_service.get_conversation_history,
             recipient=recipient,
             platform=platform,
             limit=limit
         )
         
-        return {"recipient": recipient, "messages": history}
+        # Returned directly so the DateTime values skip jsonable_encoder
+        return ApiJSONResponse({"recipient": recipient, "messages": history})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -276,7 +472,7 @@ async def delete_conversation_history(recipient: str, platform: str = "linkedin"
     Delete conversation history for a recipient
     """
     try:
-        neo4j_service.delete_conversation_history(recipient, platform)
+        await asyncio.to_thread(neo4j_service.delete_conversation_history, recipient, platform)
         return {"status": "success", "message": "Conversation history deleted"}
         
     except Exception as e:
@@ -291,63 +487,43 @@ async def store_profile(request: StoreProfileRequest):
     try:
         # Check if profile_data was provided by the extension (LinkedIn DOM scraping)
         if request.profile_data and isinstance(request.profile_data, dict) and len(request.profile_data) > 0:
-            logger.info(f"📊 Using profile data scraped from extension DOM")
+            logger.info("📊 Using profile data scraped from extension DOM")
             
             # Convert profile_data to markdown
-            markdown_lines = ["# LinkedIn Profile\n"]
-            markdown_lines.append(f"**URL:** {request.profile_url}\n")
-            
-            if request.profile_data.get('name'):
-                markdown_lines.append(f"**Name:** {request.profile_data['name']}\n")
-            if request.profile_data.get('headline'):
-                markdown_lines.append(f"**Headline:** {request.profile_data['headline']}\n")
-            if request.profile_data.get('location'):
-                markdown_lines.append(f"**Location:** {request.profile_data['location']}\n")
-            if request.profile_data.get('about'):
-                markdown_lines.append(f"\n## About\n{request.profile_data['about']}\n")
-            
-            if request.profile_data.get('experience'):
-                markdown_lines.append("\n## Experience\n")
-                for exp in request.profile_data['experience']:
-                    markdown_lines.append(f"### {exp.get('title', 'Position')}\n")
-                    if exp.get('company'):
-                        markdown_lines.append(f"**Company:** {exp['company']}\n")
-                    if exp.get('duration'):
-                        markdown_lines.append(f"**Duration:** {exp['duration']}\n")
-                    markdown_lines.append("\n")
+            pd = request.profile_data
+            parts = ["# LinkedIn Profile", "", f"**URL:** {request.profile_url}"]
+            parts.extend(f"**{label}:** {pd[key]}" for label, key in PROFILE_FIELDS if pd.get(key))
+            if about := pd.get('about'):
+                parts += ["", "## About", about]
             
-            if request.profile_data.get('education'):
-                markdown_lines.append("\n## Education\n")
-                for edu in request.profile_data['education']:
-                    markdown_lines.append(f"### {edu.get('school', 'School')}\n")
-                    if edu.get('degree'):
-                        markdown_lines.append(f"**Degree:** {edu['degree']}\n")
-                    if edu.get('years'):
-                        markdown_lines.append(f"**Years:** {edu['years']}\n")
-                    markdown_lines.append("\n")
+            for heading, entries_key, title_key, title_default, fields in PROFILE_SECTIONS:
+                entries = pd.get(entries_key)
+                if not entries:
+                    continue
+                parts += ["", f"## {heading}"]
+                for entry in entries:
+                    parts += ["", f"### {entry.get(title_key, title_default)}"]
+                    parts.extend(f"**{label}:** {entry[key]}" for label, key in fields if entry.get(key))
             
-            if request.profile_data.get('skills'):
-                markdown_lines.append("\n## Skills\n")
-                markdown_lines.append(", ".join(request.profile_data['skills']) + "\n")
+            skills = pd.get('skills')
+            if skills:
+                parts.extend(["", "## Skills", ", ".join(skills)])
             
-            markdown_content = "\n".join(markdown_lines)
-            logger.info(f"✓ Generated markdown from DOM data ({len(markdown_content)} chars)")
+            markdown_content = "\n".join(parts)
+            logger.info("✓ Generated markdown from DOM data (%s chars)", len(markdown_content))
             
         else:
             # Fallback: Use Crawl4AI for non-LinkedIn or if DOM scraping failed
-            logger.info(f"📄 Scraping profile using Crawl4AI from {request.profile_url}")
-            markdown_path = Path(__file__).resolve().parent.parent / "scraped_data.md"
-            
+            logger.info("📄 Scraping profile using Crawl4AI from %s", request.profile_url)
             if request.cookies:
-                logger.info(f"   → Using {len(request.cookies)} browser cookies for authenticated access")
-            await run_parsing(request.profile_url, markdown_path, cookies=request.cookies)
-            logger.info(f"✓ Markdown generated at {markdown_path}")
-            
-            markdown_content = markdown_path.read_text(encoding='utf-8')
+                logger.info("   → Using %s browser cookies for authenticated access", len(request.cookies))
+            markdown_content = await run_parsing(request.profile_url, cookies=request.cookies)
+            logger.info("✓ Markdown generated (%s chars)", len(markdown_content))
         
         # Store in Neo4j as unstructured data
         logger.info("💾 Storing profile in Neo4j...")
-        neo4j_service.store_scraped_profile(
+        await asyncio.to_thread(
+            neo4j_service.store_scraped_profile,
             url=request.profile_url,
             platform=request.platform,
             markdown_content=markdown_content
@@ -362,10 +538,80 @@ async def store_profile(request: StoreProfileRequest):
         }
             
     except Exception as e:
-        logger.error(f"Profile capture failed: {e}")
+        logger.error("Profile capture failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _build_chat_context(request: ChatRequest, session_id: str):
+    """
+    Fetch and format the chat context
+    Returns (current_page, full_context, chat_history_str)
+    """
+    # Steps 1-3: chat history, stored page for the current URL and knowledge
+    # snippets (recent messages and profiles) are independent Neo4j reads,
+    # so run them concurrently over the driver's connection pool
+    chat_history, current_page, recent_messages, recent_profiles = await asyncio.gather(
+        asyncio.to_thread(neo4j_service.get_chat_history, session_id=session_id, limit=10),
+        asyncio.to_thread(neo4j_service.get_page_summary, request.current_url) if request.current_url else _none(),
+        asyncio.to_thread(
+            neo4j_service.get_recent_messages,
+            platform=request.platform,
+            recipient=request.recipient,
+            limit=5
+        ),
+        asyncio.to_thread(neo4j_service.get_recent_profiles, platform=request.platform, limit=5)
+    )
+    if current_page:
+        logger.info("📄 Found stored page for current URL: %s", current_page['title'])
+    
+    # Step 4: Build knowledge context
+    knowledge_lines = []
+    
+    # Add current page content if available
+    if current_page:
+        knowledge_lines.extend([
+            f"Current Page: {current_page['title']}",
+            f"URL: {current_page['url']}",
+            f"Content:\n{current_page['content'][:PAGE_CONTENT_CAP]}",
+            ""
+        ])
+    
+    if recent_messages:
+        contact = request.recipient or "Contact"
+        knowledge_lines.append("Recent conversations:")
+        knowledge_lines.extend(f"{'You' if m['is_outgoing'] else contact}: {m['message']}" for m in recent_messages)
+    
+    if recent_profiles:
+        knowledge_lines.append("\nKnown profiles:")
+        for profile in recent_profiles:
+            # Include profile content (markdown) for better context
+            content = (profile.get("content") or "")[:PROFILE_CONTENT_CAP]
+            if content:
+                knowledge_lines.extend([f"\nProfile: {profile['url']}", f"Content:\n{content}"])
+            else:
+                # Fallback to metadata if no content
+                summary = ", ".join([f"{k}: {v}" for k, v in profile["data"].items() if v])
+                knowledge_lines.append(f"- {profile['url']} ({profile['platform']}): {summary}")
+    
+    knowledge_context = "\n".join(knowledge_lines)
+    
+    # Step 4: Build chat context with history
+    chat_context_lines = []
+    if chat_history:
+        chat_context_lines.append("Previous chat messages:")
+        # Last 5 messages for context
+        chat_context_lines.extend(f"{m['role'].capitalize()}: {m['message']}" for m in chat_history[-5:])
+    chat_history_str = "\n".join(chat_context_lines)
+    
+    # Combine knowledge and chat history
+    context_parts = []
+    if knowledge_context:
+        context_parts.append(f"Knowledge Base:\n{knowledge_context}\n\n")
+    context_parts.append(chat_history_str)
+    full_context = "".join(context_parts)
+    return current_page, full_context, chat_history_str
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -373,118 +619,103 @@ async def chat(request: ChatRequest):
     and maintains conversation history
     """
     try:
-        # Step 1: Get chat history for context (use session_id from request)
         session_id = request.session_id or "default"
-        chat_history = neo4j_service.get_chat_history(session_id=session_id, limit=10)
-        
-        # Step 2: Check if current URL has a stored page summary
-        current_page = None
-        if request.current_url:
-            current_page = neo4j_service.get_page_summary(request.current_url)
-            if current_page:
-                logger.info(f"📄 Found stored page for current URL: {current_page['title']}")
-        
-        # Step 3: Get knowledge snippets from Neo4j
-        snippets = neo4j_service.get_knowledge_snippets(
-            platform=request.platform,
-            recipient=request.recipient,
-            limit=5
-        )
-        
-        # Step 4: Build knowledge context
-        knowledge_lines = []
-        
-        # Add current page content if available
-        if current_page:
-            knowledge_lines.append(f"Current Page: {current_page['title']}")
-            knowledge_lines.append(f"URL: {current_page['url']}")
-            knowledge_lines.append(f"Content:\n{current_page['content'][:2000]}")  # First 2000 chars
-            knowledge_lines.append("")
-        
-        if snippets["messages"]:
-            knowledge_lines.append("Recent conversations:")
-            for msg in snippets["messages"]:
-                direction = "You" if msg["is_outgoing"] else (request.recipient or "Contact")
-                knowledge_lines.append(f"{direction}: {msg['message']}")
-        
-        if snippets["profiles"]:
-            knowledge_lines.append("\nKnown profiles:")
-            for profile in snippets["profiles"]:
-                # Include profile content (markdown) for better context
-                content = profile.get("content", "")
-                if content:
-                    knowledge_lines.append(f"\nProfile: {profile['url']}")
-                    knowledge_lines.append(f"Content:\n{content}")
-                else:
-                    # Fallback to metadata if no content
-                    summary = ", ".join([f"{k}: {v}" for k, v in profile["data"].items() if v])
-                    knowledge_lines.append(f"- {profile['url']} ({profile['platform']}): {summary}")
-        
-        knowledge_context = "\n".join(knowledge_lines)
-        
-        # Step 4: Build chat context with history
-        chat_context_lines = []
-        if chat_history:
-            chat_context_lines.append("Previous chat messages:")
-            for msg in chat_history[-5:]:  # Last 5 messages for context
-                chat_context_lines.append(f"{msg['role'].capitalize()}: {msg['message']}")
-        
-        # Combine knowledge and chat history
-        full_context = ""
-        if knowledge_context:
-            full_context += f"Knowledge Base:\n{knowledge_context}\n\n"
-        if chat_context_lines:
-            full_context += "\n".join(chat_context_lines)
-        
-        # Step 5: Store user's question in chat history
-        neo4j_service.store_chat_message(
-            role="user",
-            message=request.question,
-            session_id=session_id
-        )
-        
-        # Step 6: Ask LLM with full context
-        # Build chat history string for LLM
-        chat_history_str = "\n".join(chat_context_lines) if chat_context_lines else ""
+        current_page, full_context, chat_history_str = await _build_chat_context(request, session_id)
         
+        # Step 5: Ask LLM with full context
         # Pass page content if in summarizer mode (session_id == "summarizer")
         answer = await llm_service.answer_question(
             question=request.question,
             knowledge_context=full_context,
-            model=os.getenv("DEFAULT_MODEL", "fallback"),
+            model=DEFAULT_MODEL,
             session_id=session_id,
             page_title=current_page['title'] if current_page else None,
             page_content=current_page['content'] if current_page else None,
             chat_history=chat_history_str
         )
         
-        # Step 7: Store assistant's answer in chat history
-        neo4j_service.store_chat_message(
-            role="assistant",
-            message=answer,
-            session_id=session_id
+        # Step 6: Store the question and answer in chat history in one transaction
+        await asyncio.to_thread(
+            neo4j_service.store_chat_exchange,
+            session_id,
+            [
+                {"role": "user", "message": request.question},
+                {"role": "assistant", "message": answer}
+            ]
         )
         
-        logger.info(f"💬 Chat: Q={request.question[:50]}... A={answer[:50]}...")
+        logger.info("💬 Chat: Q=%s... A=%s...", request.question[:50], answer[:50])
         
         return ChatResponse(answer=answer, context_used=bool(full_context))
         
     except Exception as e:
-        logger.error(f"Chat failed: {e}")
+        logger.error("Chat failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same as /api/chat, but streams the answer as server-sent events
+    Both chat messages are stored once the stream has been sent; the stored
+    answer is the cleaned text the client received, as in /api/chat
+    """
+    session_id = request.session_id or "default"
+    try:
+        current_page, full_context, chat_history_str = await _build_chat_context(request, session_id)
+    except Exception as e:
+        logger.error("Streaming chat failed: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    answer_parts = []
+    
+    async def events():
+        async for chunk in llm_service.answer_question_stream(
+            question=request.question,
+            knowledge_context=full_context,
+            model=DEFAULT_MODEL,
+            session_id=session_id,
+            page_title=current_page['title'] if current_page else None,
+            page_content=current_page['content'] if current_page else None,
+            chat_history=chat_history_str
+        ):
+            answer_parts.append(chunk)
+            yield _sse({"delta": chunk})
+        yield _sse({"done": True, "context_used": bool(full_context)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        background=BackgroundTask(_store_chat_turn, session_id, request.question, answer_parts)
+    )
+
+
+async def _store_chat_turn(session_id: str, question: str, answer_parts: List[str]):
+    """Persist a streamed chat exchange after the response has been sent"""
+    try:
+        await asyncio.to_thread(
+            neo4j_service.store_chat_exchange,
+            session_id,
+            [
+                {"role": "user", "message": question},
+                {"role": "assistant", "message": "".join(answer_parts)}
+            ]
+        )
+    except Exception as e:
+        logger.warning("Failed to store streamed chat messages: %s", e)
+
+
 @app.delete("/api/chat-history")
 async def clear_chat_history(session_id: str = "default"):
     """
     Clear chat history to start a fresh conversation
     """
     try:
-        neo4j_service.clear_chat_history(session_id=session_id)
-        logger.info(f"🗑️ Cleared chat history for session: {session_id}")
+        await asyncio.to_thread(neo4j_service.clear_chat_history, session_id=session_id)
+        logger.info("🗑️ Cleared chat history for session: %s", session_id)
         return {"status": "success", "message": "Chat history cleared"}
     except Exception as e:
-        logger.error(f"Failed to clear chat history: {e}")
+        logger.error("Failed to clear chat history: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -494,19 +725,14 @@ async def summarize_page(request: SummarizeRequest):
     Scrape page, store as unstructured data, extract KG entities, and generate summary
     """
     try:
-        markdown_path = Path(__file__).resolve().parent.parent / "scraped_data.md"
-        
         # Step 1: Scrape the page using Crawl4AI
-        logger.info(f"📄 Scraping page for summarization: {request.url}")
+        logger.info("📄 Scraping page for summarization: %s", request.url)
         if request.cookies:
-            logger.info(f"   → Using {len(request.cookies)} browser cookies for authenticated access")
-        await run_parsing(request.url, markdown_path, cookies=request.cookies)
-        logger.info(f"✓ Markdown generated at {markdown_path}")
+            logger.info("   → Using %s browser cookies for authenticated access", len(request.cookies))
+        markdown_content = await run_parsing(request.url, cookies=request.cookies)
+        logger.info("✓ Markdown generated (%s chars)", len(markdown_content))
         
-        # Step 2: Read the markdown content
-        markdown_content = markdown_path.read_text(encoding='utf-8')
-        
-        # Step 3: Extract title from content if not provided
+        # Step 2: Extract title from content if not provided
         title = request.title
         if not title:
             first_line = markdown_content.split('\n')[0].strip()
@@ -515,43 +741,42 @@ async def summarize_page(request: SummarizeRequest):
             else:
                 title = request.url.split('/')[-1] or "Untitled Page"
         
-        # Step 4: Store markdown in Neo4j
-        logger.info(f"💾 Storing page summary in Neo4j: {title}")
-        neo4j_service.store_page_summary(
-            url=request.url,
-            title=title,
-            content=markdown_content
-        )
-        logger.info("✓ Page markdown stored")
-        
-        # Step 5: Run KG pipeline to extract structured entities
-        kg_result = {"status": "skipped"}
+        # Steps 3-5: the Neo4j write, KG extraction and LLM summary only need the
+        # markdown, so run them concurrently
+        logger.info("💾 Storing page summary in Neo4j: %s", title)
         if kg_pipeline_service:
             logger.info("🧠 Running KG pipeline for page extraction...")
-            kg_result = await kg_pipeline_service.process_page(
-                markdown_path=markdown_path,
-                page_url=request.url,
-                page_title=title
-            )
-            if kg_result["status"] == "success":
-                logger.info("✓ Page KG extraction complete")
-            else:
-                logger.warning(f"⚠️ KG extraction {kg_result['status']}: {kg_result.get('reason') or kg_result.get('error')}")
         else:
             logger.info("⚠️ KG pipeline not configured, skipping structured extraction")
-        
-        # Step 6: Generate automatic summary using LLM
         logger.info("📝 Generating automatic summary...")
-        summary = await llm_service.answer_question(
-            question="Summarize this page in a clear and concise way. Highlight the main points.",
-            knowledge_context="",
-            model=os.getenv("DEFAULT_MODEL", "fallback"),
-            session_id="summarizer",
-            page_title=title,
-            page_content=markdown_content,
-            chat_history=""
+        _, kg_result, summary = await asyncio.gather(
+            asyncio.to_thread(
+                neo4j_service.store_page_summary,
+                url=request.url,
+                title=title,
+                content=markdown_content
+            ),
+            kg_pipeline_service.process_page(
+                markdown_content=markdown_content,
+                page_url=request.url,
+                page_title=title
+            ) if kg_pipeline_service else _none(),
+            llm_service.summarize_page(
+                question="Summarize this page in a clear and concise way. Highlight the main points.",
+                page_title=title,
+                page_content=markdown_content,
+                model=DEFAULT_MODEL
+            )
         )
-        logger.info(f"✓ Summary generated ({len(summary)} chars)")
+        logger.info("✓ Page markdown stored")
+        
+        kg_result = kg_result or {"status": "skipped"}
+        if kg_result["status"] == "success":
+            logger.info("✓ Page KG extraction complete")
+        elif kg_pipeline_service:
+            logger.warning("⚠️ KG extraction %s: %s", kg_result['status'], kg_result.get('reason') or kg_result.get('error'))
+        
+        logger.info("✓ Summary generated (%s chars)", len(summary))
         
         return {
             "status": "success",
@@ -564,27 +789,37 @@ async def summarize_page(request: SummarizeRequest):
         }
             
     except Exception as e:
-        logger.error(f"Summarization failed: {e}")
+        logger.error("Summarization failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _warm_neo4j_cache():
+    """Warm Neo4j's page cache in the background so startup isn't delayed"""
+    try:
+        await asyncio.to_thread(neo4j_service.warm_cache)
+        logger.info("✓ Neo4j page cache warmed")
+    except Exception as e:
+        logger.warning("⚠️  Neo4j cache warmup failed: %s", e)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database schema on startup"""
-    logger.info("=" * 60)
+    logger.info(BANNER)
     logger.info("🚀 STARTING AI MESSAGE COMPOSER SERVER")
-    logger.info("=" * 60)
+    logger.info(BANNER)
     
     # Test Neo4j connection first
     try:
-        neo4j_connected = neo4j_service.test_connection()
+        neo4j_connected = await asyncio.to_thread(neo4j_service.test_connection)
         if neo4j_connected:
             logger.info("✓ Neo4j connection test successful")
             try:
-                neo4j_service.initialize_schema()
+                await asyncio.to_thread(neo4j_service.initialize_schema)
                 logger.info("✓ Neo4j schema initialized")
+                spawn(_warm_neo4j_cache())
             except Exception as e:
-                logger.warning(f"⚠️  Neo4j schema initialization failed: {e}")
+                logger.warning("⚠️  Neo4j schema initialization failed: %s", e)
                 logger.warning("   Server will continue, but some features may not work")
         else:
             logger.warning("⚠️  Neo4j connection failed - check your .env file")
@@ -592,9 +827,9 @@ async def startup_event():
     except Exception as e:
         error_msg = str(e)
         if "AuthenticationRateLimit" in error_msg or "authentication" in error_msg.lower():
-            logger.error("=" * 60)
+            logger.error(BANNER)
             logger.error("❌ NEO4J AUTHENTICATION ERROR")
-            logger.error("=" * 60)
+            logger.error(BANNER)
             logger.error("The password in your .env file doesn't match your Neo4j database password.")
             logger.error("")
             logger.error("To fix this:")
@@ -606,13 +841,13 @@ async def startup_event():
             logger.error("")
             logger.error("If you forgot your password:")
             logger.error("- In Neo4j Desktop, click 'Reset Password' on your database")
-            logger.error("=" * 60)
+            logger.error(BANNER)
         else:
-            logger.error(f"❌ Neo4j connection error: {e}")
+            logger.error("❌ Neo4j connection error: %s", e)
         neo4j_connected = False
     
     # Test SuperMemory connection
-    supermemory_connected = supermemory_service.test_connection()
+    supermemory_connected = await supermemory_service.test_connection()
     if supermemory_connected:
         logger.info("✓ SuperMemory connection test successful")
     else:
@@ -632,7 +867,7 @@ async def startup_event():
             logger.info("⚠️  KG Pipeline: Requires neo4j-graphrag LLM wrapper (not yet implemented)")
             logger.info("   Profiles and pages will be stored as unstructured data only")
         except Exception as e:
-            logger.warning(f"⚠️  KG Pipeline initialization failed: {e}")
+            logger.warning("⚠️  KG Pipeline initialization failed: %s", e)
             kg_pipeline_service = None
     else:
         kg_pipeline_service = None
@@ -641,31 +876,35 @@ async def startup_event():
         if not neo4j_connected:
             logger.info("⚠️  KG Pipeline disabled: Neo4j not connected")
     
-    logger.info(f"✓ Server started successfully")
-    logger.info(f"✓ Neo4j connected: {neo4j_connected}")
-    logger.info(f"✓ SuperMemory connected: {supermemory_connected}")
-    logger.info(f"✓ LLM available: {llm_available}")
-    logger.info(f"✓ KG Pipeline: {kg_pipeline_service is not None}")
+    logger.info("✓ Server started successfully")
+    logger.info("✓ Neo4j connected: %s", neo4j_connected)
+    logger.info("✓ SuperMemory connected: %s", supermemory_connected)
+    logger.info("✓ LLM available: %s", llm_available)
+    logger.info("✓ KG Pipeline: %s", kg_pipeline_service is not None)
     
     if llm_available:
         available_models = llm_service.get_available_models()
-        logger.info(f"✓ Available models: {', '.join(available_models)}")
-        default_model = os.getenv("DEFAULT_MODEL", "fallback")
-        logger.info(f"✓ Default model: {default_model}")
+        logger.info("✓ Available models: %s", ', '.join(available_models))
+        logger.info("✓ Default model: %s", DEFAULT_MODEL)
     else:
         logger.warning("⚠️  No LLM API key configured - message rewriting won't work")
         logger.warning("   Please set ANTHROPIC_API_KEY or OPENAI_API_KEY in .env file")
     
-    logger.info("=" * 60)
+    logger.info(BANNER)
     logger.info("📡 Server ready at http://0.0.0.0:8000")
     logger.info("📚 API docs at http://localhost:8000/docs")
-    logger.info("=" * 60)
+    logger.info(BANNER)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
-    neo4j_service.close()
+    if background_tasks:
+        await asyncio.gather(*list(background_tasks), return_exceptions=True)
+    await llm_http_client.aclose()
+    await supermemory_service.aclose()
+    await close_crawler()
+    await asyncio.to_thread(neo4j_service.close)
     print("✓ Server shutdown complete")
 
 
@@ -676,14 +915,16 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     debug = os.getenv("DEBUG", "True").lower() == "true"
     
-    # On Windows, force ProactorEventLoop for Playwright compatibility
-    loop_config = "asyncio" if not sys.platform.startswith("win") else "asyncio"
+    # On Windows, force ProactorEventLoop for Playwright compatibility; uvloop elsewhere
+    loop_config = "asyncio" if sys.platform.startswith("win") else "uvloop"
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
         reload=debug,
-        loop=loop_config
+        loop=loop_config,
+        http="httptools",
+        workers=int(os.getenv("WORKERS", 1))
     )
 
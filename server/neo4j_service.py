@@ -3,14 +3,48 @@ Neo4j service for storing and retrieving conversation history
 Uses a graph structure to maintain relationships between users and messages
 """
 
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Result, RoutingControl
 from typing import List, Dict, Optional
 from datetime import datetime
+import re
+
+
+# Rows per transaction in store_messages
+MESSAGE_BATCH_SIZE = 20000
+
+# Message embeddings come from the local MiniLM embedder (llm_cache.load_local_embedder).
+# Related-message search scores one recipient's messages exactly, so no vector index is kept
+MESSAGE_EMBEDDING_INDEX = "message_embedding"
+
+
+PAGE_FULLTEXT_INDEX = "page_text"
+_LUCENE_SPECIAL_RE = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+# Bare boolean operators with nothing to join are Lucene parse errors too
+_LUCENE_OPERATOR_RE = re.compile(r'\b(AND|OR|NOT)\b')
+
+
+def _scalar_props(entry: dict) -> dict:
+    """Non-empty primitive values of a dict, usable as node properties"""
+    return {k: v for k, v in entry.items() if v and isinstance(v, (str, int, float, bool))}
 
 
 class Neo4jService:
-    def __init__(self, uri: str, user: str, password: str):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    # Set once initialize_schema has run in this process
+    _schema_done = False
+
+    def __init__(self, uri: str, user: str, password: str, database: str = "neo4j", pool_size: int = 50):
+        # Explicit pool sizing and keep-alive so back-to-back API calls reuse warm connections
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=pool_size,
+            connection_acquisition_timeout=30,
+            max_connection_lifetime=300,
+            keep_alive=True,
+            connection_timeout=15
+        )
+        # Naming the database spares the driver a home-database lookup per session
+        self._db = database
     
     def close(self):
         """Close the Neo4j driver connection"""
@@ -19,16 +53,17 @@ class Neo4jService:
     def test_connection(self) -> bool:
         """Test if Neo4j connection is working"""
         try:
-            with self.driver.session() as session:
-                result = session.run("RETURN 1")
-                return result.single()[0] == 1
+            records, _, _ = self.driver.execute_query("RETURN 1", routing_=RoutingControl.READ, database_=self._db)
+            return records[0][0] == 1
         except Exception as e:
             print(f"Neo4j connection error: {e}")
             return False
     
     def initialize_schema(self):
         """Create indexes and constraints for better performance"""
-        with self.driver.session() as session:
+        if Neo4jService._schema_done:
+            return
+        with self.driver.session(database=self._db) as session:
             # Create constraints
             session.run("""
                 CREATE CONSTRAINT user_id IF NOT EXISTS
@@ -40,16 +75,83 @@ class Neo4jService:
                 FOR (m:Message) REQUIRE m.id IS UNIQUE
             """)
             
-            # Create indexes
             session.run("""
-                CREATE INDEX user_platform IF NOT EXISTS
-                FOR (u:User) ON (u.platform)
+                CREATE CONSTRAINT skill_name IF NOT EXISTS
+                FOR (s:Skill) REQUIRE s.name IS UNIQUE
             """)
             
+            # Backs MERGE (u:User {id, platform}); node keys need Enterprise edition,
+            # so fall back to a composite index elsewhere
+            try:
+                session.run("""
+                    CREATE CONSTRAINT user_id_platform IF NOT EXISTS
+                    FOR (u:User) REQUIRE (u.id, u.platform) IS NODE KEY
+                """).consume()
+            except Exception:
+                session.run("""
+                    CREATE INDEX user_id_platform IF NOT EXISTS
+                    FOR (u:User) ON (u.id, u.platform)
+                """)
+            
+            # Superseded by user_id_platform
+            session.run("DROP INDEX user_platform IF EXISTS")
+            
+            # Create indexes
             session.run("""
                 CREATE INDEX message_timestamp IF NOT EXISTS
                 FOR (m:Message) ON (m.timestamp)
             """)
+            
+            # The global top-k of a vector index rarely reaches one recipient's messages;
+            # drop the index earlier versions created so writes stop maintaining it
+            session.run(f"DROP INDEX {MESSAGE_EMBEDDING_INDEX} IF EXISTS")
+            
+            session.run("""
+                CREATE INDEX chat_session_ts IF NOT EXISTS
+                FOR (m:ChatMessage) ON (m.session_id, m.timestamp)
+            """)
+            
+            session.run("""
+                CREATE INDEX page_url IF NOT EXISTS
+                FOR (p:PageSummary) ON (p.url)
+            """)
+            
+            session.run(f"""
+                CREATE FULLTEXT INDEX {PAGE_FULLTEXT_INDEX} IF NOT EXISTS
+                FOR (p:PageSummary) ON EACH [p.title, p.url]
+            """)
+            
+            session.run("""
+                CREATE INDEX scraped_profile_url IF NOT EXISTS
+                FOR (p:ScrapedProfile) ON (p.url, p.platform)
+            """)
+            
+            # Profile recency is last_scraped; updated_at was never written, so its index stayed empty
+            session.run("DROP INDEX profile_updated IF EXISTS")
+            session.run("""
+                CREATE INDEX profile_last_scraped IF NOT EXISTS
+                FOR (p:Profile) ON (p.last_scraped)
+            """)
+            
+            session.run("""
+                CREATE INDEX scraped_profile_scraped IF NOT EXISTS
+                FOR (p:ScrapedProfile) ON (p.scraped_at)
+            """)
+        Neo4jService._schema_done = True
+    
+    def warm_cache(self):
+        """Load the graph into Neo4j's page cache so early requests don't read from disk.
+        Uses APOC's warmup when installed, otherwise touches every node and relationship.
+        """
+        with self.driver.session(database=self._db) as session:
+            try:
+                session.run("CALL apoc.warmup.run()").consume()
+            except Exception:
+                session.run("""
+                    MATCH (n)
+                    OPTIONAL MATCH (n)-[r]->()
+                    RETURN count(n) + count(r) AS touched
+                """).consume()
     
     def store_message(
         self,
@@ -57,59 +159,79 @@ class Neo4jService:
         recipient: str,
         message: str,
         is_outgoing: bool,
-        timestamp: str
+        timestamp: str,
+        embedding: Optional[List[float]] = None
     ):
         """
         Store a message in Neo4j graph
         Creates User nodes and Message nodes with relationships
+        embedding (optional) is indexed for get_related_conversations
         """
-        with self.driver.session() as session:
+        with self.driver.session(database=self._db) as session:
             session.execute_write(
                 self._create_message_tx,
                 platform,
                 recipient,
                 message,
                 is_outgoing,
-                timestamp
+                timestamp,
+                embedding
             )
     
+    def store_messages(self, messages: List[Dict]):
+        """
+        Store many messages with one UNWIND statement per batch
+        Each dict has the store_message arguments: platform, recipient, message,
+        is_outgoing, timestamp and optionally embedding
+        """
+        rows = [
+            {
+                "embedding": None,
+                **msg,
+                "message_id": f"{msg['platform']}_{msg['recipient']}_{msg['timestamp']}"
+            }
+            for msg in messages
+        ]
+        with self.driver.session(database=self._db) as session:
+            for start in range(0, len(rows), MESSAGE_BATCH_SIZE):
+                session.execute_write(self._create_messages_tx, rows[start:start + MESSAGE_BATCH_SIZE])
+    
     @staticmethod
-    def _create_message_tx(tx, platform, recipient, message, is_outgoing, timestamp):
-        """Transaction function to create message and relationships"""
-        
-        # Create or merge user node
+    def _create_messages_tx(tx, rows):
+        """Transaction function to create a batch of messages and relationships"""
         tx.run("""
-            MERGE (u:User {id: $recipient, platform: $platform})
+            UNWIND $rows AS r
+            MERGE (u:User {id: r.recipient, platform: r.platform})
             ON CREATE SET u.created_at = datetime()
             SET u.last_interaction = datetime()
-        """, recipient=recipient, platform=platform)
-        
-        # Create message node
+            MERGE (m:Message {id: r.message_id})
+            ON CREATE SET m.text = r.message,
+                          m.is_outgoing = r.is_outgoing,
+                          m.timestamp = datetime(r.timestamp),
+                          m.platform = r.platform,
+                          m.embedding = r.embedding
+            FOREACH (_ IN CASE WHEN r.is_outgoing THEN [1] ELSE [] END | MERGE (u)<-[:SENT_TO]-(m))
+            FOREACH (_ IN CASE WHEN r.is_outgoing THEN [] ELSE [1] END | MERGE (u)-[:SENT]->(m))
+        """, rows=rows)
+    
+    @staticmethod
+    def _create_message_tx(tx, platform, recipient, message, is_outgoing, timestamp, embedding=None):
+        """Transaction function to create message and relationships"""
         message_id = f"{platform}_{recipient}_{timestamp}"
         tx.run("""
-            CREATE (m:Message {
-                id: $message_id,
-                text: $message,
-                is_outgoing: $is_outgoing,
-                timestamp: datetime($timestamp),
-                platform: $platform
-            })
-        """, message_id=message_id, message=message, is_outgoing=is_outgoing, 
-             timestamp=timestamp, platform=platform)
-        
-        # Create relationship
-        if is_outgoing:
-            tx.run("""
-                MATCH (u:User {id: $recipient, platform: $platform})
-                MATCH (m:Message {id: $message_id})
-                CREATE (u)<-[:SENT_TO]-(m)
-            """, recipient=recipient, platform=platform, message_id=message_id)
-        else:
-            tx.run("""
-                MATCH (u:User {id: $recipient, platform: $platform})
-                MATCH (m:Message {id: $message_id})
-                CREATE (u)-[:SENT]->(m)
-            """, recipient=recipient, platform=platform, message_id=message_id)
+            MERGE (u:User {id: $recipient, platform: $platform})
+            ON CREATE SET u.created_at = datetime()
+            SET u.last_interaction = datetime()
+            MERGE (m:Message {id: $message_id})
+            ON CREATE SET m.text = $message,
+                          m.is_outgoing = $is_outgoing,
+                          m.timestamp = datetime($timestamp),
+                          m.platform = $platform,
+                          m.embedding = $embedding
+            FOREACH (_ IN CASE WHEN $is_outgoing THEN [1] ELSE [] END | MERGE (u)<-[:SENT_TO]-(m))
+            FOREACH (_ IN CASE WHEN $is_outgoing THEN [] ELSE [1] END | MERGE (u)-[:SENT]->(m))
+        """, recipient=recipient, platform=platform, message_id=message_id,
+             message=message, is_outgoing=is_outgoing, timestamp=timestamp, embedding=embedding)
     
     def get_conversation_history(
         self,
@@ -119,9 +241,10 @@ class Neo4jService:
     ) -> List[Dict]:
         """
         Retrieve conversation history with a recipient
-        Returns messages ordered by timestamp
+        Returns messages ordered by timestamp; timestamps stay neo4j.time.DateTime
+        and are formatted by the JSON response encoder
         """
-        with self.driver.session() as session:
+        with self.driver.session(database=self._db) as session:
             result = session.execute_read(
                 self._get_conversation_tx,
                 recipient,
@@ -134,54 +257,73 @@ class Neo4jService:
     def _get_conversation_tx(tx, recipient, platform, limit):
         """Transaction function to retrieve conversation history"""
         result = tx.run("""
-            MATCH (u:User {id: $recipient, platform: $platform})
-            MATCH (m:Message {platform: $platform})
-            WHERE (u)<-[:SENT_TO]-(m) OR (u)-[:SENT]->(m)
+            MATCH (u:User {id: $recipient, platform: $platform})-[:SENT|SENT_TO]-(m:Message {platform: $platform})
+            WITH m ORDER BY m.timestamp DESC LIMIT $limit
             RETURN m.text as message, 
                    m.is_outgoing as is_outgoing,
                    m.timestamp as timestamp
-            ORDER BY m.timestamp DESC
-            LIMIT $limit
+            ORDER BY timestamp ASC
         """, recipient=recipient, platform=platform, limit=limit)
         
-        messages = []
-        for record in result:
-            messages.append({
-                "message": record["message"],
-                "is_outgoing": record["is_outgoing"],
-                "timestamp": record["timestamp"].isoformat() if record["timestamp"] else None
-            })
-        
-        # Return in chronological order (oldest first)
-        return list(reversed(messages))
+        # Latest $limit messages, already in chronological order (oldest first)
+        return result.data()
     
     def get_related_conversations(
         self,
         recipient: str,
         platform: str,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = 0.7,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
-        Get related conversations based on graph relationships
-        This can be extended to use embeddings for semantic search
+        Get messages with a recipient that are semantically close to query_embedding
+        Scores the recipient's own messages by cosine similarity; without an
+        embedding, falls back to the most recent messages
         """
-        with self.driver.session() as session:
-            result = session.execute_read(
+        with self.driver.session(database=self._db) as session:
+            if query_embedding is None:
+                return session.execute_read(
+                    self._get_recent_conversations_tx,
+                    recipient,
+                    platform
+                )
+            return session.execute_read(
                 self._get_related_conversations_tx,
                 recipient,
-                platform
+                platform,
+                query_embedding,
+                similarity_threshold
             )
-            return result
     
     @staticmethod
-    def _get_related_conversations_tx(tx, recipient, platform):
-        """Get conversations with similar patterns or topics"""
-        # For now, return recent messages from the same platform
-        # This can be enhanced with semantic similarity
+    def _get_related_conversations_tx(tx, recipient, platform, query_embedding, similarity_threshold):
+        """
+        Nearest messages with this recipient
+        Candidates are restricted to the recipient before ranking, so close matches are
+        found however small their share of all messages; the score uses the same
+        normalized cosine as a vector index
+        """
         result = tx.run("""
-            MATCH (u:User {id: $recipient, platform: $platform})
-            MATCH (m:Message {platform: $platform})
-            WHERE (u)<-[:SENT_TO]-(m) OR (u)-[:SENT]->(m)
+            MATCH (u:User {id: $recipient, platform: $platform})-[:SENT|SENT_TO]-(m:Message)
+            WHERE m.embedding IS NOT NULL
+            WITH m, vector.similarity.cosine(m.embedding, $embedding) AS score
+            WHERE score >= $threshold
+            RETURN m.text as message,
+                   m.is_outgoing as is_outgoing,
+                   m.timestamp as timestamp,
+                   score
+            ORDER BY score DESC
+            LIMIT 5
+        """, embedding=query_embedding, threshold=similarity_threshold,
+             recipient=recipient, platform=platform)
+        
+        return result.data()
+    
+    @staticmethod
+    def _get_recent_conversations_tx(tx, recipient, platform):
+        """Most recent messages with a recipient"""
+        result = tx.run("""
+            MATCH (u:User {id: $recipient, platform: $platform})-[:SENT|SENT_TO]-(m:Message {platform: $platform})
             RETURN m.text as message,
                    m.is_outgoing as is_outgoing,
                    m.timestamp as timestamp
@@ -189,19 +331,11 @@ class Neo4jService:
             LIMIT 5
         """, recipient=recipient, platform=platform)
         
-        messages = []
-        for record in result:
-            messages.append({
-                "message": record["message"],
-                "is_outgoing": record["is_outgoing"],
-                "timestamp": record["timestamp"].isoformat() if record["timestamp"] else None
-            })
-        
-        return messages
+        return result.data()
     
     def delete_conversation_history(self, recipient: str, platform: str):
         """Delete all messages for a specific recipient"""
-        with self.driver.session() as session:
+        with self.driver.session(database=self._db) as session:
             session.execute_write(
                 self._delete_conversation_tx,
                 recipient,
@@ -212,15 +346,16 @@ class Neo4jService:
     def _delete_conversation_tx(tx, recipient, platform):
         """Transaction to delete conversation history"""
         tx.run("""
-            MATCH (u:User {id: $recipient, platform: $platform})
-            MATCH (m:Message {platform: $platform})
-            WHERE (u)<-[:SENT_TO]-(m) OR (u)-[:SENT]->(m)
+            MATCH (u:User {id: $recipient, platform: $platform})-[:SENT|SENT_TO]-(m:Message {platform: $platform})
             DETACH DELETE m
         """, recipient=recipient, platform=platform)
     
     def get_user_stats(self, recipient: str, platform: str) -> Dict:
-        """Get statistics about conversations with a user"""
-        with self.driver.session() as session:
+        """
+        Get statistics about conversations with a user
+        last_message stays a neo4j.time.DateTime, like every other reader's timestamps
+        """
+        with self.driver.session(database=self._db) as session:
             result = session.execute_read(
                 self._get_user_stats_tx,
                 recipient,
@@ -233,12 +368,16 @@ class Neo4jService:
         """Get conversation statistics"""
         result = tx.run("""
             MATCH (u:User {id: $recipient, platform: $platform})
-            MATCH (m:Message {platform: $platform})
-            WHERE (u)<-[:SENT_TO]-(m) OR (u)-[:SENT]->(m)
-            RETURN count(m) as total_messages,
-                   sum(CASE WHEN m.is_outgoing THEN 1 ELSE 0 END) as outgoing_count,
-                   sum(CASE WHEN NOT m.is_outgoing THEN 1 ELSE 0 END) as incoming_count,
-                   max(m.timestamp) as last_message
+            // Outgoing messages point SENT_TO the user, incoming ones hang off SENT,
+            // so direction alone splits the counts without reading is_outgoing
+            OPTIONAL MATCH (u)<-[:SENT_TO]-(out:Message)
+            WITH u, count(out) as outgoing_count, max(out.timestamp) as last_out
+            OPTIONAL MATCH (u)-[:SENT]->(inc:Message)
+            WITH outgoing_count, last_out, count(inc) as incoming_count, max(inc.timestamp) as last_in
+            RETURN outgoing_count + incoming_count as total_messages,
+                   outgoing_count,
+                   incoming_count,
+                   CASE WHEN last_in IS NULL OR last_out > last_in THEN last_out ELSE last_in END as last_message
         """, recipient=recipient, platform=platform)
         
         record = result.single()
@@ -247,7 +386,7 @@ class Neo4jService:
                 "total_messages": record["total_messages"],
                 "outgoing_count": record["outgoing_count"],
                 "incoming_count": record["incoming_count"],
-                "last_message": record["last_message"].isoformat() if record["last_message"] else None
+                "last_message": record["last_message"]
             }
         
         return {
@@ -258,7 +397,7 @@ class Neo4jService:
         }
 
     def store_profile(self, platform: str, profile_url: str, profile_data: dict):
-        with self.driver.session() as session:
+        with self.driver.session(database=self._db) as session:
             session.execute_write(
                 self._store_profile_tx,
                 platform,
@@ -289,153 +428,155 @@ class Neo4jService:
             raw_text=raw_text
         )
 
-        # Clear previous relationships
-        tx.run("""
-            MATCH (p:Profile {url:$profile_url, platform:$platform})-[r:HAS_EXPERIENCE]->(e:Experience)
-            DETACH DELETE e
-        """, profile_url=profile_url, platform=platform)
+        exp_rows = [
+            {"id": f"{profile_url}#experience#{idx}", "props": {**_scalar_props(exp), "index": idx}}
+            for idx, exp in enumerate(profile_data.get("experiences") or [])
+            if isinstance(exp, dict)
+        ]
+        edu_rows = [
+            {"id": f"{profile_url}#education#{idx}", "props": {**_scalar_props(edu), "index": idx}}
+            for idx, edu in enumerate(profile_data.get("education") or [])
+            if isinstance(edu, dict)
+        ]
+        # Normalized so "Python " and "python" share one Skill node
+        skill_names = list(dict.fromkeys(
+            skill.strip().lower() for skill in profile_data.get("skills") or []
+            if isinstance(skill, str) and skill.strip()
+        ))
 
+        # Remove only entries that are gone from the profile; the rest are updated in place
         tx.run("""
-            MATCH (p:Profile {url:$profile_url, platform:$platform})-[r:HAS_EDUCATION]->(e:Education)
+            MATCH (p:Profile {url:$profile_url, platform:$platform})
+            OPTIONAL MATCH (p)-[:HAS_EXPERIENCE]->(e:Experience)
+            WHERE NOT e.id IN $exp_ids
             DETACH DELETE e
-        """, profile_url=profile_url, platform=platform)
-
-        tx.run("""
-            MATCH (p:Profile {url:$profile_url, platform:$platform})-[r:HAS_SKILL]->(:Skill)
+            WITH DISTINCT p
+            OPTIONAL MATCH (p)-[:HAS_EDUCATION]->(e:Education)
+            WHERE NOT e.id IN $edu_ids
+            DETACH DELETE e
+            WITH DISTINCT p
+            OPTIONAL MATCH (p)-[r:HAS_SKILL]->(s:Skill)
+            WHERE NOT s.name IN $skill_names
             DELETE r
-        """, profile_url=profile_url, platform=platform)
+        """, profile_url=profile_url, platform=platform,
+             exp_ids=[row["id"] for row in exp_rows],
+             edu_ids=[row["id"] for row in edu_rows],
+             skill_names=skill_names)
 
-        experiences = profile_data.get("experiences") or []
-        for idx, exp in enumerate(experiences):
-            if not isinstance(exp, dict):
-                continue
-            exp_props = {k: v for k, v in exp.items() if v and isinstance(v, (str, int, float, bool))}
-            exp_props["index"] = idx
-            exp_id = f"{profile_url}#experience#{idx}"
+        if exp_rows:
             tx.run(
                 """
                 MATCH (p:Profile {url:$profile_url, platform:$platform})
-                MERGE (e:Experience {id:$exp_id})
-                SET e += $exp_props
+                UNWIND $rows AS row
+                MERGE (e:Experience {id:row.id})
+                SET e = row.props, e.id = row.id
                 MERGE (p)-[:HAS_EXPERIENCE]->(e)
                 """,
                 profile_url=profile_url,
                 platform=platform,
-                exp_id=exp_id,
-                exp_props=exp_props
+                rows=exp_rows
             )
 
-        education_list = profile_data.get("education") or []
-        for idx, edu in enumerate(education_list):
-            if not isinstance(edu, dict):
-                continue
-            edu_props = {k: v for k, v in edu.items() if v and isinstance(v, (str, int, float, bool))}
-            edu_props["index"] = idx
-            edu_id = f"{profile_url}#education#{idx}"
+        if edu_rows:
             tx.run(
                 """
                 MATCH (p:Profile {url:$profile_url, platform:$platform})
-                MERGE (e:Education {id:$edu_id})
-                SET e += $edu_props
+                UNWIND $rows AS row
+                MERGE (e:Education {id:row.id})
+                SET e = row.props, e.id = row.id
                 MERGE (p)-[:HAS_EDUCATION]->(e)
                 """,
                 profile_url=profile_url,
                 platform=platform,
-                edu_id=edu_id,
-                edu_props=edu_props
+                rows=edu_rows
             )
 
-        skills = profile_data.get("skills") or []
-        for skill in skills:
-            if not skill or not isinstance(skill, str):
-                continue
+        if skill_names:
             tx.run(
                 """
                 MATCH (p:Profile {url:$profile_url, platform:$platform})
-                MERGE (s:Skill {name:$skill})
+                UNWIND $names AS name
+                MERGE (s:Skill {name:name})
                 MERGE (p)-[:HAS_SKILL]->(s)
                 """,
                 profile_url=profile_url,
                 platform=platform,
-                skill=skill.strip()
+                names=skill_names
             )
 
-    def get_knowledge_snippets(self, platform: Optional[str] = None, recipient: Optional[str] = None, limit: int = 5) -> Dict[str, List[Dict]]:
-        """Gather recent knowledge graph snippets for chat context."""
-        with self.driver.session() as session:
-            conversations = session.execute_read(
+    def get_recent_messages(self, platform: Optional[str] = None, recipient: Optional[str] = None, limit: int = 5) -> List[Dict]:
+        """Most recent messages, optionally for one platform and/or recipient.
+        Uses its own session so it can run alongside get_recent_profiles.
+        """
+        with self.driver.session(database=self._db) as session:
+            return session.execute_read(
                 self._get_recent_messages_tx,
                 platform,
                 recipient,
                 limit
             )
-            profiles = session.execute_read(
+
+    def get_recent_profiles(self, platform: Optional[str] = None, limit: int = 5) -> List[Dict]:
+        """Most recently updated or scraped profiles, optionally for one platform."""
+        with self.driver.session(database=self._db) as session:
+            return session.execute_read(
                 self._get_recent_profiles_tx,
                 platform,
                 limit
             )
-            return {
-                "messages": conversations,
-                "profiles": profiles
-            }
 
     @staticmethod
     def _get_recent_messages_tx(tx, platform, recipient, limit):
-        query = [
-            "MATCH (m:Message)",
-        ]
-        where_clauses = []
-        params = {"limit": limit}
-        if platform:
-            where_clauses.append("m.platform = $platform")
-            params["platform"] = platform
+        # Constant query texts (one per match shape) so Neo4j reuses the cached plans
         if recipient:
-            query.append("MATCH (u:User {id: $recipient})")
-            query.append("WHERE (u)<-[:SENT_TO]-(m) OR (u)-[:SENT]->(m)")
-            params["recipient"] = recipient
-        elif where_clauses:
-            query.append("WHERE " + " AND ".join(where_clauses))
-        query.append("RETURN m.text AS message, m.is_outgoing AS is_outgoing, m.timestamp AS timestamp, m.platform AS platform")
-        query.append("ORDER BY m.timestamp DESC")
-        query.append("LIMIT $limit")
-        result = tx.run("\n".join(query), **params)
-        data = []
-        for record in result:
-            data.append({
-                "message": record["message"],
-                "is_outgoing": record["is_outgoing"],
-                "timestamp": record["timestamp"].isoformat() if record["timestamp"] else None,
-                "platform": record["platform"]
-            })
-        return data
+            # Traverse from the recipient instead of scanning every Message
+            query = """
+            MATCH (u:User {id: $recipient})-[:SENT|SENT_TO]-(m:Message)
+            WHERE $platform IS NULL OR m.platform = $platform
+            """
+        else:
+            query = """
+            MATCH (m:Message)
+            WHERE $platform IS NULL OR m.platform = $platform
+            """
+        result = tx.run(
+            query + """
+            RETURN m.text AS message, m.is_outgoing AS is_outgoing, m.timestamp AS timestamp, m.platform AS platform
+            ORDER BY m.timestamp DESC
+            LIMIT $limit
+            """,
+            platform=platform or None,
+            recipient=recipient,
+            limit=limit
+        )
+        return result.data()
 
     @staticmethod
     def _get_recent_profiles_tx(tx, platform, limit):
-        params = {"limit": limit}
-        where_clause = ""
-        if platform:
-            where_clause = "WHERE p.platform = $platform"
-            params["platform"] = platform
-        
         # Query both Profile and ScrapedProfile nodes
         result = tx.run(
-            f"""
-            CALL {{
+            """
+            CALL {
                 MATCH (p:Profile)
-                {where_clause}
-                RETURN p.url AS url, p.platform AS platform, p.updated_at AS timestamp, 
+                WHERE $platform IS NULL OR p.platform = $platform
+                RETURN p.url AS url, p.platform AS platform, p.last_scraped AS timestamp, 
                        p AS node, p.content AS content
+                ORDER BY p.last_scraped DESC
+                LIMIT $limit
                 UNION
                 MATCH (p:ScrapedProfile)
-                {where_clause}
+                WHERE $platform IS NULL OR p.platform = $platform
                 RETURN p.url AS url, p.platform AS platform, p.scraped_at AS timestamp,
                        p AS node, p.content AS content
-            }}
+                ORDER BY p.scraped_at DESC
+                LIMIT $limit
+            }
             RETURN url, platform, node, content
             ORDER BY timestamp DESC
             LIMIT $limit
             """,
-            **params
+            platform=platform or None,
+            limit=limit
         )
         profiles = []
         for record in result:
@@ -466,19 +607,19 @@ class Neo4jService:
             platform: Platform (linkedin/gmail)
             markdown_content: Full markdown content from scraping
         """
-        with self.driver.session() as session:
-            session.run(
-                """
-                MERGE (p:ScrapedProfile {url: $url, platform: $platform})
-                SET p.content = $content,
-                    p.scraped_at = datetime(),
-                    p.content_length = size($content)
-                RETURN p
-                """,
-                url=url,
-                platform=platform,
-                content=markdown_content
-            )
+        self.driver.execute_query(
+            """
+            MERGE (p:ScrapedProfile {url: $url, platform: $platform})
+            SET p.content = $content,
+                p.scraped_at = datetime(),
+                p.content_length = size($content)
+            RETURN p
+            """,
+            url=url,
+            platform=platform,
+            content=markdown_content,
+            database_=self._db
+        )
     
     def store_chat_message(self, role: str, message: str, session_id: str = "default"):
         """Store a chat message for the assistant's memory.
@@ -488,22 +629,79 @@ class Neo4jService:
             message: The message content
             session_id: Chat session identifier (default: "default")
         """
-        with self.driver.session() as session:
-            session.run(
-                """
-                CREATE (m:ChatMessage {
-                    role: $role,
-                    message: $message,
-                    session_id: $session_id,
-                    timestamp: datetime()
-                })
-                RETURN m
-                """,
-                role=role,
-                message=message,
-                session_id=session_id
-            )
+        self.driver.execute_query(
+            """
+            CREATE (m:ChatMessage {
+                role: $role,
+                message: $message,
+                session_id: $session_id,
+                timestamp: datetime()
+            })
+            RETURN m
+            """,
+            role=role,
+            message=message,
+            session_id=session_id,
+            database_=self._db
+        )
     
+    def store_chat_exchange(self, session_id: str, turns: List[Dict]):
+        """Store several chat messages in one transaction.
+        
+        Args:
+            session_id: Chat session identifier
+            turns: Messages in order, each a dict with 'role' and 'message'
+        """
+        self.driver.execute_query(
+            """
+            UNWIND range(0, size($turns) - 1) AS i
+            WITH $turns[i] AS t, i
+            CREATE (m:ChatMessage {
+                role: t.role,
+                message: t.message,
+                session_id: $session_id,
+                timestamp: datetime() + duration({milliseconds: i})
+            })
+            """,
+            turns=turns,
+            session_id=session_id,
+            database_=self._db
+        )
+
+    def append_and_fetch_chat(self, role: str, message: str, session_id: str = "default", limit: int = 20):
+        """Store a chat message and return the latest history in the same transaction.
+
+        Args:
+            role: 'user' or 'assistant'
+            message: The message content
+            session_id: Chat session identifier
+            limit: Maximum number of messages to retrieve
+
+        Returns:
+            List of chat messages in chronological order, including the new one
+        """
+        return self.driver.execute_query(
+            """
+            CREATE (:ChatMessage {
+                role: $role,
+                message: $message,
+                session_id: $session_id,
+                timestamp: datetime()
+            })
+            WITH 1 AS _
+            MATCH (m:ChatMessage {session_id: $session_id})
+            WITH m ORDER BY m.timestamp DESC LIMIT $limit
+            RETURN m.role as role, m.message as message, m.timestamp as timestamp
+            ORDER BY timestamp ASC
+            """,
+            role=role,
+            message=message,
+            session_id=session_id,
+            limit=limit,
+            database_=self._db,
+            result_transformer_=Result.data
+        )
+
     def get_chat_history(self, session_id: str = "default", limit: int = 20):
         """Retrieve chat history for assistant memory.
         
@@ -514,27 +712,19 @@ class Neo4jService:
         Returns:
             List of chat messages in chronological order
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (m:ChatMessage {session_id: $session_id})
-                RETURN m.role as role, m.message as message, m.timestamp as timestamp
-                ORDER BY m.timestamp ASC
-                LIMIT $limit
-                """,
-                session_id=session_id,
-                limit=limit
-            )
-            
-            messages = []
-            for record in result:
-                messages.append({
-                    "role": record["role"],
-                    "message": record["message"],
-                    "timestamp": str(record["timestamp"])
-                })
-            
-            return messages
+        return self.driver.execute_query(
+            """
+            MATCH (m:ChatMessage {session_id: $session_id})
+            WITH m ORDER BY m.timestamp DESC LIMIT $limit
+            RETURN m.role as role, m.message as message, m.timestamp as timestamp
+            ORDER BY timestamp ASC
+            """,
+            session_id=session_id,
+            limit=limit,
+            routing_=RoutingControl.READ,
+            database_=self._db,
+            result_transformer_=Result.data
+        )
     
     def clear_chat_history(self, session_id: str = "default"):
         """Clear chat history for a session.
@@ -542,14 +732,14 @@ class Neo4jService:
         Args:
             session_id: Chat session identifier
         """
-        with self.driver.session() as session:
-            session.run(
-                """
-                MATCH (m:ChatMessage {session_id: $session_id})
-                DELETE m
-                """,
-                session_id=session_id
-            )
+        self.driver.execute_query(
+            """
+            MATCH (m:ChatMessage {session_id: $session_id})
+            DELETE m
+            """,
+            session_id=session_id,
+            database_=self._db
+        )
     
     def store_page_summary(self, url: str, title: str, content: str):
         """Store a scraped page for summarization and Q&A.
@@ -559,20 +749,20 @@ class Neo4jService:
             title: Page title
             content: Full page content (markdown)
         """
-        with self.driver.session() as session:
-            session.run(
-                """
-                MERGE (p:PageSummary {url: $url})
-                SET p.title = $title,
-                    p.content = $content,
-                    p.scraped_at = datetime(),
-                    p.content_length = size($content)
-                RETURN p
-                """,
-                url=url,
-                title=title,
-                content=content
-            )
+        self.driver.execute_query(
+            """
+            MERGE (p:PageSummary {url: $url})
+            SET p.title = $title,
+                p.content = $content,
+                p.scraped_at = datetime(),
+                p.content_length = size($content)
+            RETURN p
+            """,
+            url=url,
+            title=title,
+            content=content,
+            database_=self._db
+        )
     
     def get_page_summary(self, url: str):
         """Retrieve a stored page by URL.
@@ -583,29 +773,30 @@ class Neo4jService:
         Returns:
             Dictionary with page data or None if not found
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (p:PageSummary {url: $url})
-                RETURN p.title as title, 
-                       p.content as content, 
-                       p.scraped_at as scraped_at,
-                       p.content_length as content_length
-                LIMIT 1
-                """,
-                url=url
-            )
-            
-            record = result.single()
-            if record:
-                return {
-                    "url": url,
-                    "title": record["title"],
-                    "content": record["content"],
-                    "scraped_at": str(record["scraped_at"]),
-                    "content_length": record["content_length"]
-                }
-            return None
+        records, _, _ = self.driver.execute_query(
+            """
+            MATCH (p:PageSummary {url: $url})
+            RETURN p.title as title, 
+                   p.content as content, 
+                   p.scraped_at as scraped_at,
+                   p.content_length as content_length
+            LIMIT 1
+            """,
+            url=url,
+            routing_=RoutingControl.READ,
+            database_=self._db
+        )
+        
+        record = records[0] if records else None
+        if record:
+            return {
+                "url": url,
+                "title": record["title"],
+                "content": record["content"],
+                "scraped_at": record["scraped_at"],
+                "content_length": record["content_length"]
+            }
+        return None
     
     def search_pages(self, query: str, limit: int = 5):
         """Search stored pages by title or URL.
@@ -617,29 +808,25 @@ class Neo4jService:
         Returns:
             List of matching pages
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (p:PageSummary)
-                WHERE p.title CONTAINS $query OR p.url CONTAINS $query
-                RETURN p.url as url, 
-                       p.title as title, 
-                       p.content_length as content_length,
-                       p.scraped_at as scraped_at
-                ORDER BY p.scraped_at DESC
-                LIMIT $limit
-                """,
-                query=query,
-                limit=limit
-            )
-            
-            pages = []
-            for record in result:
-                pages.append({
-                    "url": record["url"],
-                    "title": record["title"],
-                    "content_length": record["content_length"],
-                    "scraped_at": str(record["scraped_at"])
-                })
-            return pages
+        # A blank query is a Lucene parse error rather than an empty result
+        if not query or not query.strip():
+            return []
+        query = _LUCENE_OPERATOR_RE.sub(lambda m: m.group(1).lower(), _LUCENE_SPECIAL_RE.sub(r'\\\1', query))
+        return self.driver.execute_query(
+            """
+            CALL db.index.fulltext.queryNodes($index, $query) YIELD node AS p, score
+            RETURN p.url as url, 
+                   p.title as title, 
+                   p.content_length as content_length,
+                   p.scraped_at as scraped_at
+            ORDER BY score DESC
+            LIMIT $limit
+            """,
+            index=PAGE_FULLTEXT_INDEX,
+            query=query,
+            limit=limit,
+            routing_=RoutingControl.READ,
+            database_=self._db,
+            result_transformer_=Result.data
+        )
 
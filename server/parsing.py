@@ -1,15 +1,125 @@
 import asyncio
+import io
 import sys
+import json
+import re
+import threading
+import uuid
 import requests
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Dict, List
-from bs4 import BeautifulSoup
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional, Dict, List, Tuple
+from lxml import etree
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, BrowserConfig
 from crawl4ai.content_filter_strategy import PruningContentFilter
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 
-# Thread pool for running Crawl4AI in a separate thread with its own event loop
-_executor = ThreadPoolExecutor(max_workers=1)
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Playwright needs a Proactor loop on Windows, which the server's loop may not be,
+# so there crawls run on a dedicated background loop; elsewhere on the caller's loop
+_USE_CRAWL_THREAD = sys.platform.startswith("win")
+_crawl_loop: Optional[asyncio.AbstractEventLoop] = None
+_crawl_loop_lock = threading.Lock()
+
+# Crawl configuration is fixed, so build it once at import time
+_PRUNE_FILTER = PruningContentFilter(
+    threshold=0.45,
+    threshold_type="dynamic",
+    min_word_threshold=5
+)
+_MD_GENERATOR = DefaultMarkdownGenerator(content_filter=_PRUNE_FILTER)
+_BROWSER_CONFIG = BrowserConfig(
+    headless=True,
+    verbose=False
+)
+_RUN_CONFIG = CrawlerRunConfig(markdown_generator=_MD_GENERATOR)
+
+# Browser-backed crawler shared by all crawls on that loop, so Chromium is
+# launched once rather than per URL
+_crawler: Optional[AsyncWebCrawler] = None
+_crawler_lock: Optional[asyncio.Lock] = None
+
+# Playwright errors meaning the shared browser itself is gone, not just one page
+_BROWSER_DEAD_RE = re.compile(r"browser has been closed|browser has disconnected|browser closed|connection closed", re.IGNORECASE)
+
+# Shared session for keep-alive across metadata scrapes. Cookies are per-request
+# (each caller passes their own), so the session jar is told to store none.
+_SESSION = requests.Session()
+_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+# Common sign-in page phrases, matched in one case-insensitive pass
+_SIGNIN_RE = re.compile(r"sign in|log in|join now|create account|authentication required", re.IGNORECASE)
+
+# Meta tags rendered as dedicated fields; all others go under "Additional Metadata"
+_PRIMARY_META_KEYS = frozenset({"og:title", "og:description", "og:image", "twitter:title", "twitter:description"})
+
+# Bytes read from the response per pull-parser feed
+_HEAD_CHUNK_SIZE = 16 * 1024
+
+def _parse_head(response: requests.Response) -> Tuple[Dict[str, str], Dict[str, str], str, List[str]]:
+    """Pull-parse a streamed HTML response until </head>.
+    
+    Returns (primary Open Graph/Twitter meta, other meta, page title, JSON-LD script bodies);
+    meta dicts map name/property -> content.
+    Reading stops there, so the rest of the body is neither downloaded nor parsed.
+    """
+    primary = {}
+    extras = {}
+    title_text = ''
+    ld_json = []
+    # Decode with the HTTP header charset when the server sends one. requests reports
+    # ISO-8859-1 for any text/* response without it, which would override <meta charset>,
+    # so only an explicit charset is passed; otherwise lxml reads the meta tag itself
+    encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
+    parser = etree.HTMLPullParser(events=("end",), tag=("meta", "title", "script", "head"), encoding=encoding)
+    for chunk in response.iter_content(_HEAD_CHUNK_SIZE):
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            tag = element.tag
+            if tag == 'meta':
+                property_name = element.get('property', '') or element.get('name', '')
+                content = element.get('content', '')
+                if property_name and content:
+                    # Route once here so the markdown builder needs no second filtering pass
+                    if property_name in _PRIMARY_META_KEYS:
+                        primary[property_name] = content
+                    else:
+                        extras[property_name] = content
+            elif tag == 'title':
+                title_text = (element.text or '').strip()
+            elif tag == 'script':
+                if element.get('type') == 'application/ld+json' and element.text:
+                    ld_json.append(element.text)
+            else:  # </head>
+                return primary, extras, title_text, ld_json
+    return primary, extras, title_text, ld_json
+
+# Scalar fields of a schema.org Person rendered as-is: (JSON-LD key, label)
+_PERSON_FIELDS = (("name", "Name (from structured data)"), ("jobTitle", "Job Title"))
+
+def _write_person(buf: io.StringIO, data: dict):
+    """Write the fields of a JSON-LD Person, specialised for the shape LinkedIn emits"""
+    for key, label in _PERSON_FIELDS:
+        if key in data:
+            buf.write(f"**{label}:** {data[key]}\n\n")
+    
+    works_for = data.get('worksFor')
+    if type(works_for) is dict:
+        buf.write(f"**Company:** {works_for.get('name', '')}\n\n")
+    
+    # alumniOf is a single organisation or a list of them
+    alumni_of = data.get('alumniOf')
+    if type(alumni_of) is dict:
+        alumni_of = (alumni_of,)
+    elif type(alumni_of) is not list:
+        return
+    for school in alumni_of:
+        if type(school) is dict:
+            buf.write(f"**Education:** {school.get('name', '')}\n\n")
 
 def scrape_linkedin_metadata(url: str, cookies: Optional[List[Dict]] = None) -> str:
     """
@@ -40,82 +150,57 @@ def scrape_linkedin_metadata(url: str, cookies: Optional[List[Dict]] = None) ->
             'Upgrade-Insecure-Requests': '1'
         }
         
-        response = requests.get(url, headers=headers, cookies=cookie_dict, timeout=10)
-        response.raise_for_status()
+        # Stream the page and stop reading once the <head> metadata has been parsed
+        with _SESSION.get(url, headers=headers, cookies=cookie_dict, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            metadata, extras, title_text, ld_json = _parse_head(response)
         
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract Open Graph metadata
-        metadata = {}
-        for meta in soup.find_all('meta'):
-            property_name = meta.get('property', '') or meta.get('name', '')
-            content = meta.get('content', '')
-            if property_name and content:
-                metadata[property_name] = content
-        
-        # Build markdown from metadata
-        markdown_lines = [f"# LinkedIn Profile\n"]
-        markdown_lines.append(f"**URL:** {url}\n")
+        # Build markdown from metadata, one paragraph per field
+        buf = io.StringIO()
+        buf.write("# LinkedIn Profile\n\n")
+        buf.write(f"**URL:** {url}\n\n")
         
         # Name
         if 'og:title' in metadata:
-            markdown_lines.append(f"**Name:** {metadata['og:title']}\n")
+            buf.write(f"**Name:** {metadata['og:title']}\n\n")
         elif 'twitter:title' in metadata:
-            markdown_lines.append(f"**Name:** {metadata['twitter:title']}\n")
+            buf.write(f"**Name:** {metadata['twitter:title']}\n\n")
         
         # Description/Headline
         if 'og:description' in metadata:
-            markdown_lines.append(f"**Headline:** {metadata['og:description']}\n")
+            buf.write(f"**Headline:** {metadata['og:description']}\n\n")
         elif 'twitter:description' in metadata:
-            markdown_lines.append(f"**Headline:** {metadata['twitter:description']}\n")
-        elif 'description' in metadata:
-            markdown_lines.append(f"**Headline:** {metadata['description']}\n")
+            buf.write(f"**Headline:** {metadata['twitter:description']}\n\n")
+        elif 'description' in extras:
+            buf.write(f"**Headline:** {extras['description']}\n\n")
         
         # Image
         if 'og:image' in metadata:
-            markdown_lines.append(f"**Profile Image:** {metadata['og:image']}\n")
+            buf.write(f"**Profile Image:** {metadata['og:image']}\n\n")
         
         # Try to extract additional info from page title and meta tags
-        title_tag = soup.find('title')
-        if title_tag and title_tag.text:
-            title_text = title_tag.text.strip()
+        if title_text:
             # LinkedIn titles often have format: "Name | LinkedIn"
             if '|' in title_text:
                 parts = title_text.split('|')
                 if len(parts) > 1:
-                    markdown_lines.append(f"**Full Title:** {parts[0].strip()}\n")
+                    buf.write(f"**Full Title:** {parts[0].strip()}\n\n")
         
         # Look for structured data (JSON-LD)
-        for script in soup.find_all('script', type='application/ld+json'):
+        for script_text in ld_json:
             try:
-                import json
-                data = json.loads(script.string)
-                if isinstance(data, dict):
-                    if data.get('@type') == 'Person':
-                        if 'name' in data:
-                            markdown_lines.append(f"**Name (from structured data):** {data['name']}\n")
-                        if 'jobTitle' in data:
-                            markdown_lines.append(f"**Job Title:** {data['jobTitle']}\n")
-                        if 'worksFor' in data and isinstance(data['worksFor'], dict):
-                            markdown_lines.append(f"**Company:** {data['worksFor'].get('name', '')}\n")
-                        if 'alumniOf' in data:
-                            if isinstance(data['alumniOf'], list):
-                                for school in data['alumniOf']:
-                                    if isinstance(school, dict):
-                                        markdown_lines.append(f"**Education:** {school.get('name', '')}\n")
-                            elif isinstance(data['alumniOf'], dict):
-                                markdown_lines.append(f"**Education:** {data['alumniOf'].get('name', '')}\n")
-            except:
-                pass
+                data = _json_loads(script_text)
+            except ValueError:
+                continue
+            if type(data) is dict and data.get('@type') == 'Person':
+                _write_person(buf, data)
         
         # Add all other metadata as additional info
-        markdown_lines.append("\n## Additional Metadata\n")
-        for key, value in metadata.items():
-            if key not in ['og:title', 'og:description', 'og:image', 'twitter:title', 'twitter:description']:
-                markdown_lines.append(f"- **{key}:** {value}\n")
+        buf.write("\n## Additional Metadata\n\n")
+        for key, value in extras.items():
+            buf.write(f"- **{key}:** {value}\n\n")
         
-        markdown_content = '\n'.join(markdown_lines)
+        markdown_content = buf.getvalue()
         
         print(f"✓ Scraped LinkedIn metadata: {len(markdown_content)} characters")
         return markdown_content
@@ -124,96 +209,108 @@ def scrape_linkedin_metadata(url: str, cookies: Optional[List[Dict]] = None) ->
         print(f"❌ LinkedIn metadata scraping failed: {e}")
         return f"# LinkedIn Profile\n\n**URL:** {url}\n\n**Error:** Failed to scrape profile metadata.\n\nError details: {str(e)}"
 
-def _run_in_new_loop(url, out, cookies=None):
-    """Run Crawl4AI in a new event loop (for Windows compatibility)"""
-    # Set Windows event loop policy in this thread
-    if sys.platform.startswith("win"):
-        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-    
-    # Create a new event loop for this thread
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def _get_crawl_loop() -> asyncio.AbstractEventLoop:
+    """Start the background Proactor loop used for crawls on Windows"""
+    global _crawl_loop
+    with _crawl_loop_lock:
+        if _crawl_loop is None:
+            loop = asyncio.WindowsProactorEventLoopPolicy().new_event_loop()
+            threading.Thread(target=loop.run_forever, name="crawl4ai-loop", daemon=True).start()
+            _crawl_loop = loop
+    return _crawl_loop
+
+async def _run_on_crawl_loop(coro):
+    """Await a coroutine on the loop that owns the crawler"""
+    if not _USE_CRAWL_THREAD:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_crawl_loop()))
+
+async def _get_crawler() -> AsyncWebCrawler:
+    """Start the shared crawler on first use"""
+    global _crawler, _crawler_lock
+    if _crawler is not None:
+        return _crawler
+    if _crawler_lock is None:
+        _crawler_lock = asyncio.Lock()
+    # Concurrent first calls must not each launch a browser
+    async with _crawler_lock:
+        if _crawler is None:
+            _crawler = await AsyncWebCrawler(config=_BROWSER_CONFIG).__aenter__()
+    return _crawler
+
+async def _discard_crawler(crawler: AsyncWebCrawler):
+    """Close a crawler unless another coroutine has already replaced or closed it"""
+    global _crawler
+    if _crawler is not crawler:
+        return
+    _crawler = None
+    await crawler.__aexit__(None, None, None)
+
+async def _crawl(url, cookies=None) -> str:
+    """The actual Crawl4AI logic with cookie support; returns the page markdown"""
+    crawler = await _get_crawler()
+
+    # Each crawl runs in its own session (browser context) that is killed
+    # afterwards, so one caller's cookies never reach another caller's crawl
+    session_id = f"crawl-{uuid.uuid4().hex}"
+
+    # If cookies are provided, set them before crawling
+    extra_args = {}
+    if cookies:
+        # Convert cookie list to Playwright format
+        extra_args['cookies'] = cookies
     
     try:
-        loop.run_until_complete(_crawl(url, out, cookies))
-    finally:
-        loop.close()
-
-async def _crawl(url, out, cookies=None):
-    """The actual Crawl4AI logic with cookie support"""
-    # Step 1: Create a pruning filter
-    prune_filter = PruningContentFilter(
-        threshold=0.45,
-        threshold_type="dynamic",
-        min_word_threshold=5      
-    )
-
-    # Step 2: Insert it into a Markdown Generator
-    md_generator = DefaultMarkdownGenerator(content_filter=prune_filter)
-
-    # Step 3: Configure browser with headless mode
-    browser_config = BrowserConfig(
-        headless=True,
-        verbose=False
-    )
-
-    # Step 4: Pass it to CrawlerRunConfig
-    config = CrawlerRunConfig(
-        markdown_generator=md_generator
-    )
-
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        # If cookies are provided, set them before crawling
-        extra_args = {}
-        if cookies:
-            # Convert cookie list to Playwright format
-            extra_args['cookies'] = cookies
-        
         result = await crawler.arun(
             url=url, 
-            config=config,
+            config=_RUN_CONFIG.clone(session_id=session_id),
             **extra_args
         )
+    except Exception as e:
+        # Only a dead browser is dropped; other crawls may still be using a live one
+        if _BROWSER_DEAD_RE.search(str(e)):
+            await _discard_crawler(crawler)
+        raise
+    finally:
+        if _crawler is crawler:
+            try:
+                await crawler.crawler_strategy.kill_session(session_id)
+            except Exception as e:
+                print(f"⚠️ Failed to close crawl session {session_id}: {e}")
 
-        if result.success:
-            markdown_content = result.markdown.fit_markdown
-            
-            # Check if we got a sign-in page (common indicators)
-            signin_indicators = [
-                "sign in",
-                "log in",
-                "join now",
-                "create account",
-                "authentication required"
-            ]
-            
-            content_lower = markdown_content.lower()
-            is_signin_page = any(indicator in content_lower for indicator in signin_indicators)
-            
-            # If it's mostly a sign-in page and very short, it's likely blocked
-            if is_signin_page and len(markdown_content) < 500:
-                print("⚠️ Warning: Detected sign-in page. LinkedIn may be blocking the request.")
-                print("   Tip: The extension should pass browser cookies for authenticated access.")
-            
-            print("Raw Markdown length:", len(result.markdown.raw_markdown))
-            print("Fit Markdown length:", len(markdown_content))
-            
-            with open(out, "w", encoding="utf-8") as f:
-                f.write(markdown_content)
-        else:
-            print("Error:", result.error_message)
-            # Write error to file so we know what happened
-            with open(out, "w", encoding="utf-8") as f:
-                f.write(f"# Scraping Error\n\nFailed to scrape {url}\n\nError: {result.error_message}")
-
-async def run_parsing(url, out, cookies: Optional[List[Dict]] = None):
-    """Called from main.py - runs Crawl4AI in a separate thread
+    if result.success:
+        markdown_content = result.markdown.fit_markdown
+        
+        # If it's mostly a sign-in page and very short, it's likely blocked
+        if len(markdown_content) < 500 and _SIGNIN_RE.search(markdown_content):
+            print("⚠️ Warning: Detected sign-in page. LinkedIn may be blocking the request.")
+            print("   Tip: The extension should pass browser cookies for authenticated access.")
+        
+        print("Raw Markdown length:", len(result.markdown.raw_markdown))
+        print("Fit Markdown length:", len(markdown_content))
+        
+        return markdown_content
+    else:
+        print("Error:", result.error_message)
+        # Return the error as markdown so we know what happened
+        return f"# Scraping Error\n\nFailed to scrape {url}\n\nError: {result.error_message}"
+
+async def run_parsing(url, cookies: Optional[List[Dict]] = None) -> str:
+    """Called from main.py - runs Crawl4AI on the server loop (background loop on Windows)
     
     Args:
         url: URL to scrape
-        out: Output file path
         cookies: Optional list of cookies in Playwright format
                  [{"name": "li_at", "value": "...", "domain": ".linkedin.com", ...}]
+    
+    Returns:
+        Markdown content of the page
     """
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(_executor, _run_in_new_loop, url, str(out), cookies)
\ No newline at end of file
+    return await _run_on_crawl_loop(_crawl(url, cookies))
+
+async def close_crawler():
+    """Shut down the shared crawler's browser; called from main.py on shutdown"""
+    if _crawler is not None:
+        await _run_on_crawl_loop(_discard_crawler(_crawler))
+    if _crawl_loop is not None:
+        _crawl_loop.call_soon_threadsafe(_crawl_loop.stop)
\ No newline at end of file
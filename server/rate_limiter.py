@@ -0,0 +1,64 @@
+"""
+Client-side rate limiting for LLM provider calls
+Waits before a request would exceed the configured requests/tokens per minute
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0
+
+
+class RateLimiter:
+    """Sliding one-minute window over request and token counts.
+
+    A limit of 0 disables that dimension. A single request larger than the
+    token limit is let through once the window is empty, so it cannot block forever.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._tokens_in_window = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    async def acquire(self, tokens: int):
+        """Wait until a request costing ``tokens`` fits in the current window"""
+        if not self.enabled:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if self._fits(tokens):
+                    self._window.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                delay = self._window[0][0] + WINDOW_SECONDS - now
+                logger.info(f"   → Throttling LLM call for {delay:.2f}s to stay under rate limits")
+                await asyncio.sleep(max(delay, 0.01))
+
+    def _expire(self, now: float):
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            _, tokens = self._window.popleft()
+            self._tokens_in_window -= tokens
+
+    def _fits(self, tokens: int) -> bool:
+        if not self._window:
+            return True
+        if self.requests_per_minute and len(self._window) + 1 > self.requests_per_minute:
+            return False
+        if self.tokens_per_minute and self._tokens_in_window + tokens > self.tokens_per_minute:
+            return False
+        return True
@@ -6,11 +6,22 @@ Reference: portfolio.py for SuperMemory v3 API usage.
 
 import os
 import json
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
-import requests
+import httpx
+from cachetools import TTLCache
+
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +33,11 @@ class SuperMemoryService:
         self,
         api_key: Optional[str] = None,
         container: str = "ai-composer",
-        base_url: str = "https://api.supermemory.ai/v3"
+        base_url: str = "https://api.supermemory.ai/v3",
+        max_batch_size: int = 50,
+        batch_interval_ms: int = 10,
+        search_cache_size: int = 512,
+        search_cache_ttl: float = 30.0
     ):
         """Initialize SuperMemory service.
         
@@ -30,13 +45,47 @@ class SuperMemoryService:
             api_key: SuperMemory API key (defaults to env var)
             container: Container tag for organizing memories
             base_url: SuperMemory API base URL
+            max_batch_size: Pending message writes that trigger an immediate flush
+            batch_interval_ms: How long message writes are coalesced before flushing
+            search_cache_size: Search responses kept in memory
+            search_cache_ttl: Seconds a cached search response stays valid
         """
         self.api_key = api_key or os.getenv("SUPERMEMORY_API_KEY")
         self.container = container
         self.base_url = base_url
+        # Built once and reused by every search payload; treat as read-only
+        self._container_tags = [container]
+        self.max_batch_size = max_batch_size
+        self.batch_interval_ms = batch_interval_ms
+        
+        # Message writes waiting for the next flush, with the future each caller awaits
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # (query, limit, containerTags) -> search results; cleared on every write
+        self._search_cache: TTLCache = TTLCache(maxsize=search_cache_size, ttl=search_cache_ttl)
+        self._search_locks: Dict[Tuple, asyncio.Lock] = {}
         
         if not self.api_key:
             logger.warning("SuperMemory API key not set. Set SUPERMEMORY_API_KEY environment variable.")
+        
+        # Pooled keep-alive connections; awaiting them keeps the event loop free
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self._headers(),
+            timeout=30,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20)
+        )
+    
+    async def aclose(self):
+        """Flush pending message writes and close the pooled HTTP client."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._pending:
+            await self._flush()
+        await self._client.aclose()
     
     def _headers(self) -> Dict[str, str]:
         """Get headers for API requests."""
@@ -45,16 +94,15 @@ class SuperMemoryService:
             "Content-Type": "application/json"
         }
     
-    def test_connection(self) -> bool:
+    async def test_connection(self) -> bool:
         """Test if SuperMemory connection is working."""
         if not self.api_key:
             return False
         try:
             # Try a simple search to test connection
-            response = requests.post(
-                f"{self.base_url}/search",
-                headers=self._headers(),
-                json={"q": "test", "limit": 1, "containerTags": [self.container]},
+            response = await self._client.post(
+                "/search",
+                content=_json_dumps({"q": "test", "limit": 1, "containerTags": self._container_tags}),
                 timeout=5
             )
             return response.status_code in (200, 201)
@@ -62,7 +110,7 @@ class SuperMemoryService:
             logger.error(f"SuperMemory connection test failed: {e}")
             return False
     
-    def store_message(
+    async def store_message(
         self,
         platform: str,
         recipient: str,
@@ -108,19 +156,54 @@ Message:
                 "is_outgoing": is_outgoing,
                 "timestamp": timestamp
             },
-            "containerTags": [self.container]
+            # Per-recipient/platform tags let get_conversation_history filter server-side
+            "containerTags": [self.container, *self._conversation_tags(recipient, platform)]
         }
         
+        # Coalesce writes arriving within batch_interval_ms into one flush
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, future))
+        if len(self._pending) >= self.max_batch_size:
+            if self._flush_task:
+                self._flush_task.cancel()
+            self._flush_task = asyncio.create_task(self._flush_after(0))
+        elif not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_after(self.batch_interval_ms))
+        return await future
+    
+    async def _flush_after(self, delay_ms: int):
+        await asyncio.sleep(delay_ms / 1000)
+        # Detach first so a full batch arriving mid-flush schedules its own task
+        self._flush_task = None
+        await self._flush()
+    
+    async def _flush(self):
+        """Send every pending message write and resolve the callers' futures.
+        
+        SuperMemory v3 has no bulk document endpoint, so the batch goes out as
+        concurrent requests multiplexed over the pooled HTTP/2 connection.
+        """
+        batch, self._pending = self._pending, []
+        results = await asyncio.gather(
+            *(self._post_document(payload) for payload, _ in batch),
+            return_exceptions=True
+        )
+        # New documents may change any search result
+        self._search_cache.clear()
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    async def _post_document(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            response = requests.post(
-                f"{self.base_url}/documents",
-                headers=self._headers(),
-                json=payload,
-                timeout=30
-            )
+            response = await self._client.post("/documents", content=_json_dumps(payload))
             response.raise_for_status()
             
-            result = response.json()
+            result = _json_loads(response.content)
             doc_id = result.get("document", {}).get("id", "unknown")
             logger.info(f"✓ Stored message in SuperMemory: {doc_id}")
             
@@ -130,7 +213,11 @@ Message:
             logger.error(f"Failed to store message in SuperMemory: {e}")
             raise
     
-    def get_conversation_history(
+    @staticmethod
+    def _conversation_tags(recipient: str, platform: str) -> List[str]:
+        return [f"recipient:{recipient}", f"platform:{platform}"]
+    
+    async def get_conversation_history(
         self,
         recipient: str,
         platform: str = "linkedin",
@@ -154,41 +241,45 @@ Message:
         query = f"conversation {recipient} {platform}"
         
         try:
-            response = requests.post(
-                f"{self.base_url}/search",
-                headers=self._headers(),
-                json={
-                    "q": query,
-                    "limit": limit,
-                    "containerTags": [self.container],
-                    "includeFullDocs": True
-                },
-                timeout=30
+            # The recipient/platform tags narrow results server-side; messages stored
+            # before those tags existed only carry the container tag, so top up from
+            # a container-wide search when the tagged one comes back short
+            results = await self._search(
+                query,
+                limit,
+                [self.container, *self._conversation_tags(recipient, platform)]
             )
-            response.raise_for_status()
-            
-            results = response.json().get("results", [])
+            if len(results) < limit:
+                results = [*results, *await self._search(query, limit)]
             
             # Filter and format results
             messages = []
+            seen = set()
             for item in results:
                 metadata = item.get("metadata", {})
                 
-                # Only include conversation type messages for this recipient
-                if (metadata.get("type") == "conversation" and 
-                    metadata.get("recipient") == recipient and
-                    metadata.get("platform") == platform):
-                    
-                    # Extract message from content
-                    content = item.get("content", "")
-                    message_text = content.split("Message:")[-1].strip() if "Message:" in content else content
-                    
-                    messages.append({
-                        "message": message_text,
-                        "is_outgoing": metadata.get("is_outgoing", False),
-                        "timestamp": metadata.get("timestamp", ""),
-                        "platform": metadata.get("platform", platform)
-                    })
+                # Only include conversation type messages for this recipient; this
+                # also guards against tag filters being matched with OR semantics
+                if not (metadata.get("type") == "conversation" and 
+                        metadata.get("recipient") == recipient and
+                        metadata.get("platform") == platform):
+                    continue
+                
+                item_id = item.get("id") or item.get("content")
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                
+                # Extract message from content
+                content = item.get("content", "")
+                message_text = content.split("Message:")[-1].strip() if "Message:" in content else content
+                
+                messages.append({
+                    "message": message_text,
+                    "is_outgoing": metadata.get("is_outgoing", False),
+                    "timestamp": metadata.get("timestamp", ""),
+                    "platform": metadata.get("platform", platform)
+                })
             
             # Sort by timestamp (most recent first)
             messages.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
@@ -200,7 +291,7 @@ Message:
             logger.error(f"Failed to retrieve conversation history: {e}")
             return []
     
-    def search_knowledge(
+    async def search_knowledge(
         self,
         query: str,
         limit: int = 5
@@ -219,20 +310,7 @@ Message:
             return []
         
         try:
-            response = requests.post(
-                f"{self.base_url}/search",
-                headers=self._headers(),
-                json={
-                    "q": query,
-                    "limit": limit,
-                    "containerTags": [self.container],
-                    "includeFullDocs": True
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            results = response.json().get("results", [])
+            results = await self._search(query, limit)
             logger.info(f"Found {len(results)} results for query: {query}")
             
             return results
@@ -241,7 +319,49 @@ Message:
             logger.error(f"SuperMemory search failed: {e}")
             return []
     
-    def get_knowledge_snippets(
+    async def _search(
+        self,
+        query: str,
+        limit: int,
+        container_tags: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """POST /search, served from the TTL cache when the same search ran recently.
+        
+        Concurrent misses for one key share a lock so only one request goes out.
+        Raises on HTTP errors; failures are not cached.
+        """
+        container_tags = container_tags or self._container_tags
+        key = (query, limit, tuple(container_tags))
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        lock = self._search_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                cached = self._search_cache.get(key)
+                if cached is not None:
+                    return cached
+                
+                response = await self._client.post(
+                    "/search",
+                    content=_json_dumps({
+                        "q": query,
+                        "limit": limit,
+                        "containerTags": container_tags,
+                        "includeFullDocs": True
+                    })
+                )
+                response.raise_for_status()
+                
+                results = _json_loads(response.content).get("results", [])
+                self._search_cache[key] = results
+                return results
+        finally:
+            if not lock.locked():
+                self._search_locks.pop(key, None)
+    
+    async def get_knowledge_snippets(
         self,
         platform: Optional[str] = None,
         recipient: Optional[str] = None,
@@ -266,7 +386,7 @@ Message:
         
         query = " ".join(query_parts) if query_parts else "recent"
         
-        results = self.search_knowledge(query, limit=limit * 2)
+        results = await self.search_knowledge(query, limit=limit * 2)
         
         messages = []
         profiles = []
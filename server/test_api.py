@@ -5,9 +5,21 @@ Run this to verify your backend is working correctly
 
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 BASE_URL = "http://localhost:8000"
+BANNER = "=" * 60
+
+# One keep-alive session per thread; requests.Session isn't documented as thread-safe
+_local = threading.local()
+
+def _session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
 
 def print_test(name, passed, details=""):
     status = "✓ PASS" if passed else "✗ FAIL"
@@ -20,7 +32,7 @@ def test_health():
     """Test health check endpoint"""
     print("Testing health check...")
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=5)
+        response = _session().get(f"{BASE_URL}/health", timeout=5)
         data = response.json()
         
         passed = (
@@ -52,7 +64,7 @@ def test_rewrite():
             "tone": "professional"
         }
         
-        response = requests.post(
+        response = _session().post(
             f"{BASE_URL}/api/rewrite",
             json=payload,
             timeout=10
@@ -85,7 +97,7 @@ def test_store_conversation():
             "timestamp": datetime.now().isoformat()
         }
         
-        response = requests.post(
+        response = _session().post(
             f"{BASE_URL}/api/store-conversation",
             json=payload,
             timeout=5
@@ -107,7 +119,7 @@ def test_get_conversation_history():
     """Test retrieving conversation history"""
     print("Testing conversation history retrieval...")
     try:
-        response = requests.get(
+        response = _session().get(
             f"{BASE_URL}/api/conversation-history/Test%20User",
             params={"platform": "linkedin", "limit": 10},
             timeout=5
@@ -146,7 +158,7 @@ def test_rewrite_with_context():
             "tone": "professional"
         }
         
-        response = requests.post(
+        response = _session().post(
             f"{BASE_URL}/api/rewrite",
             json=payload,
             timeout=10
@@ -167,31 +179,41 @@ def test_rewrite_with_context():
         return False
 
 def main():
-    print("=" * 60)
+    print(BANNER)
     print("AI Message Composer - API Test Suite")
-    print("=" * 60)
+    print(BANNER)
     print()
     
     # Check if server is reachable
     try:
-        requests.get(BASE_URL, timeout=2)
+        _session().get(BASE_URL, timeout=2)
     except:
         print("✗ ERROR: Cannot reach server at", BASE_URL)
         print("  Make sure the server is running: python main.py")
         return
     
-    # Run tests
-    results = []
-    results.append(("Health Check", test_health()))
-    results.append(("Message Rewrite", test_rewrite()))
-    results.append(("Store Conversation", test_store_conversation()))
-    results.append(("Get History", test_get_conversation_history()))
-    results.append(("Rewrite with Context", test_rewrite_with_context()))
+    # Run independent tests concurrently; history is read after the store
+    # so it runs in the same job
+    def store_then_history():
+        return [
+            ("Store Conversation", test_store_conversation()),
+            ("Get History", test_get_conversation_history())
+        ]
+    
+    jobs = [
+        lambda: [("Health Check", test_health())],
+        lambda: [("Message Rewrite", test_rewrite())],
+        store_then_history,
+        lambda: [("Rewrite with Context", test_rewrite_with_context())]
+    ]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        # map keeps submission order, so the summary lists tests as before
+        results = [result for job_results in pool.map(lambda job: job(), jobs) for result in job_results]
     
     # Summary
-    print("=" * 60)
+    print(BANNER)
     print("Test Summary")
-    print("=" * 60)
+    print(BANNER)
     
     passed = sum(1 for _, result in results if result)
     total = len(results)
@@ -208,7 +230,7 @@ def main():
     else:
         print("⚠️  Some tests failed. Check the errors above.")
     
-    print("=" * 60)
+    print(BANNER)
 
 if __name__ == "__main__":
     main()
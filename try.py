@@ -1,19 +1,6 @@
-from __future__ import annotations
-
 import asyncio
-import logging
-from pathlib import Path
-from typing import Optional
+import sys
 
-import requests
-from bs4 import BeautifulSoup
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
-from crawl4ai.content_filter_strategy import PruningContentFilter
-from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
-
-logger = logging.getLogger(__name__)
-
-import asyncio
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
 from crawl4ai.content_filter_strategy import PruningContentFilter
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
@@ -26,7 +13,7 @@ async def main(url,out):
         # "fixed" or "dynamic"
         threshold_type="dynamic",
         # Ignore nodes with <5 words
-        min_word_threshold=5      
+        min_word_threshold=5
     )
 
     # Step 2: Insert it into a Markdown Generator
@@ -39,7 +26,7 @@ async def main(url,out):
 
     async with AsyncWebCrawler() as crawler:
         result = await crawler.arun(
-            url=url, 
+            url=url,
             config=config
         )
 
@@ -53,11 +40,7 @@ async def main(url,out):
             print("Error:", result.error_message)
 
 if __name__ == "__main__":
-    asyncio.run(main(r"https://www.linkedin.com/in/kvndoshi/", r"C:\Users\kevin\vscode_files\claudehacksextension\scraped_data.md"))
-
-
-# def generate_clean_markdown_sync(url: str, output_path: Path) -> Path:
-#     asyncio.run(main(r"https://www.linkedin.com/in/kvndoshi/", r"C:\Users\kevin\vscode_files\claudehacksextension\scraped_data.md"))as
-#     return output_path
-
-
+    # Usage: python try.py [url] [output.md]
+    url = sys.argv[1] if len(sys.argv) > 1 else "https://www.linkedin.com/in/kvndoshi/"
+    out = sys.argv[2] if len(sys.argv) > 2 else "scraped_data.md"
+    asyncio.run(main(url, out))